@@ -0,0 +1,395 @@
+"""AsyncGitlabManager, an asyncio counterpart of GitlabManager."""
+
+import asyncio
+import base64
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+from gitlabs import FileInfo, git_blob_sha
+
+
+class AsyncGitlabManager:
+    """
+    Same API as GitlabManager, but every method is a coroutine and requests
+    share one pool of keep-alive connections.
+
+    Use it as an async context manager, or call open() and aclose():
+
+        async with AsyncGitlabManager(token, url, project_id) as manager:
+            contents = await manager.get_files(paths)
+
+    Args:
+        token (str): The GitLab access token.
+        base_url (str): The base URL of the GitLab instance.
+        project_id (int): The ID of the GitLab project.
+        max_in_flight (int, optional): Upper bound of concurrent requests.
+            Defaults to 10.
+        timeout (float, optional): Per request timeout in seconds.
+            Defaults to 30.
+
+    Attributes:
+        client: The underlying httpx.AsyncClient.
+        branch_names (set): A set containing the names of all branches.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str,
+        project_id: int,
+        max_in_flight: int = 10,
+        timeout: float = 30.0,
+    ):
+        project = quote(str(project_id), safe="")
+        self.client = httpx.AsyncClient(
+            base_url=f"{base_url.rstrip('/')}/api/v4/projects/{project}",
+            headers={"PRIVATE-TOKEN": token},
+            limits=httpx.Limits(
+                max_connections=max_in_flight,
+                max_keepalive_connections=max_in_flight,
+            ),
+            timeout=timeout,
+        )
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.branch_names = set()
+
+    async def open(self) -> "AsyncGitlabManager":
+        branches = await self._list("/repository/branches")
+        self.branch_names = {branch["name"] for branch in branches}
+        return self
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncGitlabManager":
+        try:
+            return await self.open()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _request(
+        self, method: str, url: str, **kwargs
+    ) -> httpx.Response:
+        async with self._semaphore:
+            response = await self.client.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def _list(self, url: str, params: Optional[dict] = None) -> list:
+        params = {**(params or {}), "per_page": 100}
+        first = await self._request("GET", url, params=params)
+        items = first.json()
+        total_pages = first.headers.get("X-Total-Pages")
+        if total_pages:
+            pages = await asyncio.gather(*(
+                self._request("GET", url, params={**params, "page": page})
+                for page in range(2, int(total_pages) + 1)
+            ))
+            for page in pages:
+                items.extend(page.json())
+            return items
+
+        # GitLab leaves out the totals above 10,000 records, so walk the
+        # pages one by one until there is no next page
+        response = first
+        while True:
+            next_page = response.headers.get("X-Next-Page")
+            if next_page:
+                response = await self._request(
+                    "GET", url, params={**params, "page": next_page}
+                )
+            elif "next" in response.links:
+                response = await self._request(
+                    "GET", response.links["next"]["url"]
+                )
+            else:
+                return items
+            items.extend(response.json())
+
+    @staticmethod
+    def _file_url(path: str) -> str:
+        return f"/repository/files/{quote(path, safe='')}"
+
+    def _validate_path(self, path: str):
+        if not path:
+            raise ValueError("Path cannot be empty")
+
+    def _validate_branch(self, branch: str):
+        if branch not in self.branch_names:
+            raise ValueError(
+                f"Branch '{branch}' does not exist in the project"
+            )
+
+    async def get_file(
+        self, path: str, branch: str = "main"
+    ) -> Optional[str]:
+        """
+        Retrieves the content of a file.
+
+        Args:
+            path (str): The path of the file.
+            branch (str, optional): The branch name. Defaults to main.
+
+        Returns:
+            Optional[str]: The content of the file,
+            or None if the file is not found.
+        """
+        try:
+            response = await self._request(
+                "GET", self._file_url(path), params={"ref": branch}
+            )
+            return base64.b64decode(response.json()["content"]).decode()
+        except httpx.HTTPError as e:
+            print(f"Error retrieving file {path}: {e}")
+            return None
+
+    async def get_files(
+        self, paths: Iterable[str], branch: str = "main"
+    ) -> Dict[str, Optional[str]]:
+        """
+        Retrieves the contents of many files concurrently.
+
+        Args:
+            paths (Iterable[str]): The paths of the files.
+            branch (str, optional): The branch name. Defaults to main.
+
+        Returns:
+            Dict[str, Optional[str]]: path -> content, None if not found.
+        """
+        paths = list(paths)
+        contents = await asyncio.gather(
+            *(self.get_file(path, branch) for path in paths)
+        )
+        return dict(zip(paths, contents))
+
+    async def judge_file_or_folder_exist(
+        self, path: str, branch: str = "main"
+    ) -> bool:
+        """
+        Checks if a file or folder exists in the repository.
+
+        Args:
+            path (str): The path of the file or folder.
+            branch (str, optional): The branch name. Defaults to "main".
+
+        Returns:
+            bool: True if the file or folder exists, False otherwise.
+        """
+        self._validate_path(path)
+        self._validate_branch(branch)
+
+        try:
+            await self._request(
+                "HEAD", self._file_url(path), params={"ref": branch}
+            )
+            return True
+        except httpx.HTTPError:
+            pass
+
+        try:
+            await self._request(
+                "GET",
+                "/repository/tree",
+                params={"path": path, "ref": branch, "per_page": 1},
+            )
+            return True
+        except httpx.HTTPError:
+            return False
+
+    async def judge_paths_exist(
+        self, paths: Iterable[str], branch: str = "main"
+    ) -> Dict[str, bool]:
+        """
+        Checks concurrently whether files or folders exist.
+
+        Args:
+            paths (Iterable[str]): The paths of the files or folders.
+            branch (str, optional): The branch name. Defaults to "main".
+
+        Returns:
+            Dict[str, bool]: path -> True if it exists.
+        """
+        paths = list(paths)
+        results = await asyncio.gather(*(
+            self.judge_file_or_folder_exist(path, branch) for path in paths
+        ))
+        return dict(zip(paths, results))
+
+    async def get_all_files_path_in_folder(
+        self, folder_path: str = "", branch: str = "main"
+    ) -> List[str]:
+        """
+        Retrieves all file paths in a folder.
+
+        Args:
+            folder_path (str, optional): The path of the folder.
+            Defaults to "" (root folder).
+            branch (str, optional): The branch name. Defaults to "main".
+
+        Returns:
+            List[str]: A list of file paths.
+        """
+        self._validate_branch(branch)
+        try:
+            tree = await self._list("/repository/tree", {
+                "path": folder_path or "/",
+                "ref": branch,
+                "recursive": "true",
+            })
+            return [item["path"] for item in tree if item["type"] == "blob"]
+        except httpx.HTTPError as e:
+            print(f"Error retrieving files in folder: {e}")
+            return []
+
+    async def _commit(
+        self, actions: List[dict], commit_message: str, branch: str
+    ):
+        await self._request("POST", "/repository/commits", json={
+            "actions": actions,
+            "branch": branch,
+            "commit_message": commit_message,
+        })
+
+    async def commit_files_to_gitlab(
+        self,
+        files: List[FileInfo],
+        commit_message: str,
+        branch: str = "main",
+        compare_by_sha: bool = False,
+    ) -> bool:
+        """
+        Commits changes to GitLab.
+
+        Args:
+            files (List[FileInfo]): A list of FileInfo obj contain file info
+            commit_message (str): The commit message.
+            branch (str, optional): The branch name. Defaults to "main".
+            compare_by_sha (bool, optional): Compare git blob SHAs against
+                one tree listing instead of downloading every file
+                concurrently. Defaults to False.
+
+        Returns:
+            bool: True if the commit is successful, False otherwise.
+        """
+        self._validate_branch(branch)
+        actions = []
+
+        try:
+            if compare_by_sha:
+                tree = await self._list("/repository/tree", {
+                    "ref": branch, "recursive": "true"
+                })
+                remote_blob_ids = {
+                    item["path"]: item["id"]
+                    for item in tree
+                    if item["type"] == "blob"
+                }
+            else:
+                existing = await self.get_files(
+                    (file_info.file_path for file_info in files), branch
+                )
+
+            for file_info in files:
+                file_path = file_info.file_path
+                content = file_info.content
+
+                if compare_by_sha:
+                    remote_blob_id = remote_blob_ids.get(file_path)
+                    exists = remote_blob_id is not None
+                    unchanged = remote_blob_id == git_blob_sha(content)
+                else:
+                    exists = existing[file_path] is not None
+                    unchanged = existing[file_path] == content
+
+                if unchanged:
+                    print(f"Skipping commit for file {file_path}")
+                    continue
+
+                actions.append({
+                    "action": "update" if exists else "create",
+                    "file_path": file_path,
+                    "content": content,
+                })
+
+            if not actions:
+                print("No files need to commit.")
+            else:
+                await self._commit(actions, commit_message, branch)
+            return True
+
+        except httpx.HTTPError as e:
+            print(f"Error committing files to GitLab: {e}")
+            return False
+
+    async def delete_file_on_gitlab(
+        self, file_path: str, commit_message: str, branch: str = "main"
+    ) -> bool:
+        """
+        Deletes a file from GitLab.
+
+        Args:
+            file_path (str): The path of the file to delete.
+            commit_message (str): The commit message for the deletion.
+            branch (str, optional): The branch name. Defaults to "main".
+
+        Returns:
+            bool: True if the deletion is successful, False otherwise.
+        """
+        self._validate_path(file_path)
+        self._validate_branch(branch)
+        if not await self.judge_file_or_folder_exist(file_path, branch):
+            print(f"File '{file_path}' does not exist.")
+            return True
+
+        try:
+            await self._request(
+                "DELETE",
+                self._file_url(file_path),
+                params={"branch": branch, "commit_message": commit_message},
+            )
+            return True
+        except httpx.HTTPError as e:
+            print(f"Error deleting file on GitLab: {e}")
+            return False
+
+    async def delete_folder_on_gitlab(
+        self, folder_path: str, commit_message: str, branch: str = "main"
+    ) -> bool:
+        """
+        Deletes a folder and its contents from the GitLab repository.
+
+        Args:
+            folder_path (str): The path of the folder to be deleted.
+            commit_message (str): The commit message for the deletion.
+            branch (str, optional): The name of the branch. Defaults to "main".
+
+        Returns:
+            bool: True if the deletion is successful, False otherwise.
+        """
+        self._validate_path(folder_path)
+        self._validate_branch(branch)
+
+        files = await self.get_all_files_path_in_folder(folder_path, branch)
+        if not files:
+            print(f"Folder '{folder_path}' does not exist.")
+            return True
+
+        try:
+            await self._commit(
+                [
+                    {"action": "delete", "file_path": file_path}
+                    for file_path in files
+                ],
+                commit_message,
+                branch,
+            )
+            return True
+        except httpx.HTTPError as e:
+            print(f"Error deleting folder on GitLab: {e}")
+            return False
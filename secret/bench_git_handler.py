@@ -0,0 +1,500 @@
+"""Benchmarks for GitHandler against local git repositories."""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from git import Repo
+
+from test import GitHandler, Hunk, WorktreePool
+
+GIT_ENV = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@example.com",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@example.com",
+}
+
+
+def git(cwd: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        env=GIT_ENV,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+def write_files(root: str, files: Dict[str, str]):
+    for path, content in files.items():
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(content)
+
+
+def make_branch_repo(
+    path: str, n_files: int, n_lines: int, changed_every: int = 3
+) -> str:
+    """
+    Creates a repository with a "main" and a "test" branch, where "test"
+    changes every changed_every-th line of every file.
+
+    Returns:
+        str: The repository path.
+    """
+    os.makedirs(path)
+    git(path, "init", "-q", "-b", "main")
+    write_files(path, {
+        f"configs/F{i:05d}/golden_config": "".join(
+            f"interface eth{line}\n" for line in range(n_lines)
+        )
+        for i in range(n_files)
+    })
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "base")
+    git(path, "checkout", "-q", "-b", "test")
+    write_files(path, {
+        f"configs/F{i:05d}/golden_config": "".join(
+            f"interface eth{line}"
+            + (" shutdown" if line % changed_every == 0 else "")
+            + "\n"
+            for line in range(n_lines)
+        )
+        for i in range(n_files)
+    })
+    git(path, "commit", "-q", "-a", "-m", "change")
+    git(path, "checkout", "-q", "main")
+    return path
+
+
+def make_wide_repo(path: str, n_files: int, n_changed: int) -> str:
+    """
+    Creates a repository of n_files small files with a "main" and a "test"
+    branch, where "test" changes n_changed of them.
+
+    Returns:
+        str: The repository path.
+    """
+    os.makedirs(path)
+    git(path, "init", "-q", "-b", "main")
+    files = {
+        f"configs/{i % 100:02d}/F{i:06d}/golden_config": "".join(
+            f"interface eth{line}\n" for line in range(20)
+        )
+        for i in range(n_files)
+    }
+    write_files(path, files)
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "base")
+    git(path, "checkout", "-q", "-b", "test")
+    step = max(n_files // max(n_changed, 1), 1)
+    write_files(path, {
+        file_path: content.replace("eth7\n", "eth7 shutdown\n")
+        for file_path, content in list(files.items())[::step][:n_changed]
+    })
+    git(path, "commit", "-q", "-a", "-m", "change")
+    git(path, "checkout", "-q", "main")
+    return path
+
+
+def make_bare_repo(
+    path: str, n_files: int, n_commits: int, n_folders: int = 10
+) -> str:
+    """
+    Creates a bare repository whose main branch has n_commits commits,
+    each of them rewriting every file with random content that neither
+    compresses nor deltas well, spread over n_folders folders.
+
+    Returns:
+        str: The file:// URL of the repository.
+    """
+    work = path + ".work"
+    os.makedirs(work)
+    git(work, "init", "-q", "-b", "main")
+    for commit in range(n_commits):
+        write_files(work, {
+            f"site{i % n_folders}/F{i:05d}/golden_config": "".join(
+                f"interface eth{line} {os.urandom(8).hex()}\n"
+                for line in range(40)
+            )
+            for i in range(n_files)
+        })
+        git(work, "add", "-A")
+        git(work, "commit", "-q", "-m", f"commit {commit}")
+    git(work, "clone", "-q", "--bare", work, path)
+    git(path, "config", "uploadpack.allowFilter", "true")
+    git(path, "config", "uploadpack.allowAnySHA1InWant", "true")
+    return "file://" + path
+
+
+def disk_usage(path: str) -> int:
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            full_path = os.path.join(root, name)
+            if not os.path.islink(full_path):
+                total += os.path.getsize(full_path)
+    return total
+
+
+def _measure(func) -> Dict[str, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak": peak, "result": result}
+
+
+def bench_diff_parse(n_files: int = 20, n_lines: int = 100000) -> List[dict]:
+    """
+    Peak Python memory and time of parsing a branch diff into a list of
+    dicts from one string, against streaming it with iter_diff.
+
+    Args:
+        n_files (int, optional): Files in the repository.
+        n_lines (int, optional): Lines per file, a third of them change.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_branch_repo(os.path.join(tmp, "repo"), n_files, n_lines)
+        handler = GitHandler("", path, "")
+        diff_bytes = len(Repo(path).git.diff("main", "test"))
+
+        def parse_string():
+            output = Repo(path).git.diff("main", "test")
+            return sum(
+                len(chunk["changes"])
+                for item in handler.parse_diff_output(output)
+                for chunk in item["chunks"]
+            )
+
+        def parse_stream():
+            return sum(
+                len(record.lines)
+                for record in handler.iter_diff("main", "test")
+                if isinstance(record, Hunk)
+            )
+
+        rows = []
+        for mode, func in (
+            ("string + parse_diff_output", parse_string),
+            ("iter_diff", parse_stream),
+        ):
+            result = _measure(func)
+            rows.append({
+                "mode": mode,
+                "diff_mb": diff_bytes / 1e6,
+                "lines": result["result"],
+                "seconds": result["seconds"],
+                "peak_mb": result["peak"] / 1e6,
+            })
+        return rows
+
+
+def bench_diff_modes(
+    n_files: int = 100000, n_changed: int = 5000, workers: List[int] = (1, 4)
+) -> List[dict]:
+    """
+    Time of the diff_summary modes and of git_diff_to_file with several
+    worker counts on a wide repository.
+
+    Args:
+        n_files (int, optional): Files in the repository.
+        n_changed (int, optional): Files changed between the branches.
+        workers (List[int], optional): Worker counts for the full patch.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_wide_repo(os.path.join(tmp, "repo"), n_files, n_changed)
+        handler = GitHandler("", path, "")
+        for mode in ("name-only", "numstat", "changed-lines"):
+            start = time.perf_counter()
+            summary = handler.diff_summary("main", "test", mode)
+            rows.append({
+                "mode": mode,
+                "files": len(summary),
+                "seconds": time.perf_counter() - start,
+            })
+
+        output_path = os.path.join(tmp, "out.diff")
+        for max_workers in workers:
+            start = time.perf_counter()
+            handler.git_diff_to_file(
+                "main", "test", output_path, max_workers=max_workers
+            )
+            rows.append({
+                "mode": f"patch to file, {max_workers} workers",
+                "mb": os.path.getsize(output_path) / 1e6,
+                "seconds": time.perf_counter() - start,
+            })
+    return rows
+
+
+def bench_clone_modes(n_files: int = 5000, n_commits: int = 20) -> List[dict]:
+    """
+    Clone time and disk use of clone_or_pull_repository in each clone mode
+    against a local bare repository, and of a pull after one new commit.
+
+    Args:
+        n_files (int, optional): Files in the repository.
+        n_commits (int, optional): Commits, each rewriting every file.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    modes = {
+        "full": {},
+        "depth=1": {"depth": 1},
+        "partial": {"partial": True},
+        "partial + sparse site0": {
+            "partial": True, "sparse_paths": ["site0"],
+        },
+        "depth=1 + partial + sparse site0": {
+            "depth": 1, "partial": True, "sparse_paths": ["site0"],
+        },
+    }
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        bare = os.path.join(tmp, "origin.git")
+        url = make_bare_repo(bare, n_files, n_commits)
+        clones = {}
+        for index, (mode, options) in enumerate(modes.items()):
+            destination = os.path.join(tmp, f"clone{index}")
+            handler = GitHandler(url, destination, "", **options)
+            start = time.perf_counter()
+            handler.clone_or_pull_repository()
+            rows.append({
+                "mode": f"clone {mode}",
+                "seconds": time.perf_counter() - start,
+                "disk_mb": disk_usage(destination) / 1e6,
+            })
+            clones[mode] = handler
+
+        pusher = os.path.join(tmp, "pusher")
+        git(tmp, "clone", "-q", url, pusher)
+        write_files(pusher, {"site0/F00000/golden_config": "changed\n"})
+        git(pusher, "commit", "-q", "-a", "-m", "change")
+        git(pusher, "push", "-q", "origin", "main")
+        for mode, handler in clones.items():
+            start = time.perf_counter()
+            handler.clone_or_pull_repository()
+            rows.append({
+                "mode": f"pull {mode}",
+                "seconds": time.perf_counter() - start,
+                "disk_mb": disk_usage(handler.destination_path) / 1e6,
+            })
+    return rows
+
+
+def bench_incremental_commit(
+    n_files: int = 200000, n_changed: int = 10
+) -> List[dict]:
+    """
+    Time of commit_and_push_changes after editing n_changed files through
+    GitHandler, with the full work tree scan and with incremental staging.
+
+    Args:
+        n_files (int, optional): Files in the checkout.
+        n_changed (int, optional): Files edited, added and deleted before
+            each commit.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_wide_repo(os.path.join(tmp, "work"), n_files, 1)
+        bare = os.path.join(tmp, "origin.git")
+        git(tmp, "clone", "-q", "--bare", path, bare)
+        destination = os.path.join(tmp, "clone")
+        git(tmp, "clone", "-q", "file://" + bare, destination)
+        git(destination, "config", "user.name", "bench")
+        git(destination, "config", "user.email", "bench@example.com")
+        handler = GitHandler("file://" + bare, destination, "")
+        existing = git(destination, "ls-files").split()
+
+        for run, incremental in enumerate((False, True, False, True)):
+            for i in range(n_changed):
+                handler.add_file(existing[i], f"hostname run{run}\n")
+                handler.add_file(f"new/run{run}/F{i}/golden_config", "new\n")
+            handler.delete_file(existing[n_changed + run])
+            start = time.perf_counter()
+            handler.commit_and_push_changes(
+                f"run {run}", "main", incremental=incremental
+            )
+            rows.append({
+                "mode": "incremental" if incremental else "full scan",
+                "seconds": time.perf_counter() - start,
+                "committed": len(git(
+                    destination, "diff", "--name-only", "HEAD~1", "HEAD"
+                ).split()),
+                "clean": not git(destination, "status", "--porcelain"),
+            })
+    return rows
+
+
+def bench_worktree_pool(
+    n_files: int = 20000,
+    n_jobs: int = 16,
+    n_branches: int = 8,
+    workers: List[int] = (1, 4, 8),
+) -> List[dict]:
+    """
+    Throughput of branch jobs (edit 20 files, commit, push) run through a
+    WorktreePool with several pool sizes once its worktrees exist, and the
+    disk used by the pool against one full clone per worker.
+
+    Args:
+        n_files (int, optional): Files in the repository.
+        n_jobs (int, optional): Jobs per pool size.
+        n_branches (int, optional): Branches the jobs are spread over,
+            main (the branch of the checkout) among them.
+        workers (List[int], optional): Pool sizes to compare.
+
+    Returns:
+        List[dict]: One result row per pool size.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_wide_repo(os.path.join(tmp, "work"), n_files, 1)
+        for branch in range(1, n_branches):
+            git(path, "branch", f"job{branch}", "main")
+        bare = os.path.join(tmp, "origin.git")
+        git(tmp, "clone", "-q", "--bare", path, bare)
+        destination = os.path.join(tmp, "clone")
+        git(tmp, "clone", "-q", "file://" + bare, destination)
+        git(destination, "config", "user.name", "bench")
+        git(destination, "config", "user.email", "bench@example.com")
+        handler = GitHandler("file://" + bare, destination, "")
+        clone_mb = disk_usage(destination) / 1e6
+
+        for max_workers in workers:
+            pool = WorktreePool(handler, max_size=max_workers)
+
+            def job(index):
+                branch = index % n_branches
+                branch = f"job{branch}" if branch else "main"
+                with pool.lease(branch) as worker:
+                    for i in range(20):
+                        worker.add_file(
+                            f"jobs/{index}/F{i}",
+                            f"job {index} {max_workers}\n",
+                        )
+                    worker.commit_and_push_changes(
+                        f"job {index}", branch, incremental=True
+                    )
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Creating the worktrees is a one-off cost, time reuse only
+                list(executor.map(job, range(n_jobs, n_jobs + max_workers)))
+                start = time.perf_counter()
+                list(executor.map(job, range(n_jobs)))
+                seconds = time.perf_counter() - start
+            pool_mb = disk_usage(pool.root) / 1e6
+            pool.close()
+            rows.append({
+                "mode": f"{max_workers} worktrees",
+                "jobs_per_second": n_jobs / seconds,
+                "pool_mb": pool_mb,
+                "clones_mb": clone_mb * max_workers,
+            })
+    return rows
+
+
+def bench_diff_index(
+    n_files: int = 100000, n_changed: int = 5000, n_queries: int = 10000
+) -> List[dict]:
+    """
+    Time of GitHandler.diff_index on first use, from memory, from its disk
+    cache in a new GitHandler, and of line-range and prefix queries.
+
+    Args:
+        n_files (int, optional): Files in the repository.
+        n_changed (int, optional): Files changed between the branches.
+        n_queries (int, optional): Queries of each kind.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_wide_repo(os.path.join(tmp, "repo"), n_files, n_changed)
+
+        def timed(mode, func):
+            start = time.perf_counter()
+            result = func()
+            rows.append({
+                "mode": mode,
+                "milliseconds": (time.perf_counter() - start) * 1000,
+            })
+            return result
+
+        handler = GitHandler("", path, "")
+        index = timed("build", lambda: handler.diff_index("main", "test"))
+        timed("memory cache", lambda: handler.diff_index("main", "test"))
+        timed(
+            "disk cache, new GitHandler",
+            lambda: GitHandler("", path, "").diff_index("main", "test"),
+        )
+        files = index.changed_files()
+        timed(f"{n_queries} line-range queries", lambda: [
+            index.hunks_touching(files[i % len(files)], 5, 12)
+            for i in range(n_queries)
+        ])
+        timed(f"{n_queries} prefix queries", lambda: [
+            index.changed_files(f"configs/{i % 100:02d}/")
+            for i in range(n_queries)
+        ])
+    return rows
+
+
+def print_rows(title: str, rows: List[dict]):
+    print(f"== {title}")
+    for row in rows:
+        print("  ".join(
+            f"{key}={value:.3f}" if isinstance(value, float)
+            else f"{key}={value}"
+            for key, value in row.items()
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--files", type=int, default=100000)
+    args = parser.parse_args()
+
+    print_rows(
+        f"diff parse, 20 files of {args.lines} lines",
+        bench_diff_parse(n_lines=args.lines),
+    )
+    print_rows(
+        f"diff modes, {args.files} files",
+        bench_diff_modes(n_files=args.files),
+    )
+    print_rows("clone modes, 5000 files, 20 commits", bench_clone_modes())
+    print_rows(
+        "commit_and_push_changes, 200k files",
+        bench_incremental_commit(),
+    )
+    print_rows("worktree pool, 20k files, 16 jobs", bench_worktree_pool())
+    print_rows(
+        f"diff index, {args.files} files",
+        bench_diff_index(n_files=args.files),
+    )
@@ -0,0 +1,810 @@
+"""Benchmarks for GitlabManager against a local FakeGitlab server."""
+
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from async_gitlabs import AsyncGitlabManager
+from fake_gitlab import FakeGitlab
+from gitlab_fanout import fan_out, read_folder
+from gitlab_http import ConditionalCache, GitlabMetrics, RateLimitScheduler
+from gitlabs import BlobCache, FileBatch, FileInfo, GitlabManager
+
+PROJECT_ID = 1
+
+
+def golden_configs(n_files: int, version: int = 0) -> Dict[str, str]:
+    """Synthetic switch_status/*/golden_config files."""
+    return {
+        f"switch_status/F{i:05d}/golden_config": (
+            f"hostname F{i:05d}\n" + f"interface eth{version}\n" * 20
+        )
+        for i in range(n_files)
+    }
+
+
+def _run(fake: FakeGitlab, func) -> Dict[str, float]:
+    fake.reset_counters()
+    start = time.perf_counter()
+    func()
+    return {
+        "seconds": time.perf_counter() - start,
+        "calls": fake.total_calls,
+        "bytes": fake.bytes_sent,
+    }
+
+
+def bench_commit_compare(
+    n_files: int = 2000, changed_ratio: float = 0.1, latency: float = 0.002
+) -> List[dict]:
+    """
+    Compares commit_files_to_gitlab with per-file downloads against the
+    blob SHA comparison.
+
+    Args:
+        n_files (int, optional): Files already on the branch.
+        changed_ratio (float, optional): Share of files that get new content.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    remote = golden_configs(n_files)
+    local = dict(remote)
+    for path in list(local)[: int(n_files * changed_ratio)]:
+        local[path] += "changed\n"
+    files = [FileInfo(file_path=p, content=c) for p, c in local.items()]
+
+    rows = []
+    with FakeGitlab(latency=latency) as fake:
+        for compare_by_sha in (False, True):
+            fake.add_project(PROJECT_ID, {"main": remote})
+            manager = GitlabManager("token", fake.url, PROJECT_ID)
+            result = _run(fake, lambda: manager.commit_files_to_gitlab(
+                files, "bench", compare_by_sha=compare_by_sha
+            ))
+            result["mode"] = "sha" if compare_by_sha else "download"
+            rows.append(result)
+    return rows
+
+
+def bench_bulk_reads(
+    n_files: int = 500, max_in_flight: int = 16, latency: float = 0.01
+) -> List[dict]:
+    """
+    Compares reading every file with GitlabManager.get_file one by one
+    against AsyncGitlabManager.get_files.
+
+    Args:
+        n_files (int, optional): Files to read.
+        max_in_flight (int, optional): Concurrency of the async manager.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    remote = golden_configs(n_files)
+
+    async def read_async(url: str):
+        async with AsyncGitlabManager(
+            "token", url, PROJECT_ID, max_in_flight=max_in_flight
+        ) as manager:
+            await manager.get_files(remote)
+
+    rows = []
+    with FakeGitlab(latency=latency) as fake:
+        fake.add_project(PROJECT_ID, {"main": remote})
+        manager = GitlabManager("token", fake.url, PROJECT_ID)
+        result = _run(fake, lambda: [manager.get_file(p) for p in remote])
+        result["mode"] = "sync"
+        rows.append(result)
+
+        result = _run(fake, lambda: asyncio.run(read_async(fake.url)))
+        result["mode"] = f"async x{max_in_flight}"
+        rows.append(result)
+    return rows
+
+
+def bench_cached_reads(
+    n_files: int = 500, latency: float = 0.002
+) -> List[dict]:
+    """
+    Reads every file without a cache, then through a BlobCache with
+    get_file and get_files, cold and warm. Each run uses a fresh manager
+    and cache object sharing one cache directory.
+
+    Args:
+        n_files (int, optional): Files to read.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    remote = golden_configs(n_files)
+    rows = []
+    with FakeGitlab(latency=latency) as fake, \
+            tempfile.TemporaryDirectory() as cache_dir:
+        fake.add_project(PROJECT_ID, {"main": remote})
+        modes = [
+            ("no cache", None),
+            ("get_file cold", cache_dir),
+            ("get_file warm", cache_dir),
+            ("get_files cold", cache_dir + "/bulk"),
+            ("get_files warm", cache_dir + "/bulk"),
+        ]
+        for mode, directory in modes:
+            cache = BlobCache(directory) if directory else None
+            manager = GitlabManager(
+                "token", fake.url, PROJECT_ID, blob_cache=cache
+            )
+            if mode.startswith("get_files"):
+                func = lambda: manager.get_files(list(remote))
+            else:
+                func = lambda: [manager.get_file(p) for p in remote]
+            result = _run(fake, func)
+            result["mode"] = mode
+            if cache is not None:
+                result["mode"] += f" {cache.stats()}"
+            rows.append(result)
+    return rows
+
+
+def bench_path_lookups(
+    n_files: int = 2000, n_lookups: int = 200, latency: float = 0.002
+) -> List[dict]:
+    """
+    Runs existence checks and folder listings with and without the
+    commit-pinned tree index.
+
+    Args:
+        n_files (int, optional): Files on the branch.
+        n_lookups (int, optional): Paths and folders looked up.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    remote = golden_configs(n_files)
+    folders = [p.rsplit("/", 1)[0] for p in list(remote)[:n_lookups]]
+
+    def lookups(manager: GitlabManager):
+        for folder in folders:
+            manager.judge_file_or_folder_exist(folder)
+            manager.judge_file_or_folder_exist(folder + "/missing")
+            manager.get_all_files_path_in_folder(folder)
+
+    rows = []
+    with FakeGitlab(latency=latency) as fake:
+        fake.add_project(PROJECT_ID, {"main": remote})
+        modes = [("api", False, 0.0), ("tree index", True, 0.0)]
+        modes.append(("tree index, ttl 60s", True, 60.0))
+        for mode, use_tree_index, ttl in modes:
+            manager = GitlabManager(
+                "token",
+                fake.url,
+                PROJECT_ID,
+                use_tree_index=use_tree_index,
+                tree_index_ttl=ttl,
+            )
+            result = _run(fake, lambda: lookups(manager))
+            result["mode"] = mode
+            rows.append(result)
+    return rows
+
+
+def bench_chunked_commit(
+    n_files: int = 5000, max_actions: int = 1000, latency: float = 0.002
+) -> List[dict]:
+    """
+    Commits n_files new files with commit_files_in_chunks.
+
+    Args:
+        n_files (int, optional): Files to commit.
+        max_actions (int, optional): Actions per commit.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row with the throughput in the mode column.
+    """
+    local = golden_configs(n_files)
+    with FakeGitlab(latency=latency) as fake:
+        fake.add_project(PROJECT_ID, {"main": {"README.md": "configs"}})
+        manager = GitlabManager("token", fake.url, PROJECT_ID)
+        result = _run(fake, lambda: manager.commit_files_in_chunks(
+            (FileInfo(file_path=p, content=c) for p, c in local.items()),
+            "bench",
+            max_actions=max_actions,
+        ))
+    stats = manager.last_bulk_commit_stats
+    result["mode"] = (
+        f"{stats.commits} commits, {stats.files_per_second:.0f} files/s, "
+        f"{stats.mb_per_second:.2f} MB/s"
+    )
+    return [result]
+
+
+def bench_cold_start(
+    n_branches: int = 2000, latency: float = 0.002
+) -> List[dict]:
+    """
+    Times constructing a GitlabManager and running a first
+    get_all_files_path_in_folder on a project with many branches.
+
+    "full branch list" reads branch_names up front like the old eager
+    constructor, "lazy" validates the branch with one lookup and
+    "snapshot" reloads the branch names saved by a previous run.
+
+    Args:
+        n_branches (int, optional): Branches of the project.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    files = golden_configs(10)
+    branches = {f"feature/{i:05d}": files for i in range(n_branches)}
+    branches["main"] = files
+    rows = []
+    with FakeGitlab(latency=latency) as fake, \
+            tempfile.TemporaryDirectory() as tmp:
+        fake.add_project(PROJECT_ID, branches)
+        snapshot = f"{tmp}/branches.json"
+        for mode in ("full branch list", "lazy", "snapshot"):
+
+            def first_call():
+                manager = GitlabManager(
+                    "token",
+                    fake.url,
+                    PROJECT_ID,
+                    branch_snapshot_path=snapshot if mode != "lazy" else None,
+                )
+                if mode == "full branch list":
+                    manager.branch_names
+                manager.get_all_files_path_in_folder("switch_status")
+
+            result = _run(fake, first_call)
+            result["mode"] = mode
+            rows.append(result)
+    return rows
+
+
+def _serve_forever(files: Dict[str, bytes], conn):
+    with FakeGitlab() as fake:
+        fake.add_project(PROJECT_ID, {"main": files})
+        conn.send(fake.url)
+        conn.recv()
+
+
+def bench_large_file_reads(sizes_mb: List[int] = (16, 64)) -> List[dict]:
+    """
+    Peak Python memory of reading one large file with get_file,
+    get_file_bytes and download_file.
+
+    The server runs in a child process so that tracemalloc only sees the
+    client side.
+
+    Args:
+        sizes_mb (List[int], optional): File sizes to test, in MB.
+
+    Returns:
+        List[dict]: One result row per size and mode.
+    """
+    files = {
+        f"dumps/{size}.bin": os.urandom(size * 1024 * 1024)
+        for size in sizes_mb
+    }
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(
+        target=_serve_forever, args=(files, child_conn), daemon=True
+    )
+    server.start()
+    url = parent_conn.recv()
+    manager = GitlabManager("token", url, PROJECT_ID)
+    devnull = open(os.devnull, "wb")
+    readers = {
+        "get_file": manager.get_file,
+        "get_file_bytes": manager.get_file_bytes,
+        "download_file": lambda p: manager.download_file(p, devnull),
+    }
+    del files
+
+    rows = []
+    try:
+        for size in sizes_mb:
+            for mode, read in readers.items():
+                path = f"dumps/{size}.bin"
+                tracemalloc.start()
+                start = time.perf_counter()
+                try:
+                    read(path)
+                except UnicodeDecodeError:
+                    pass
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                rows.append({
+                    "mode": f"{mode}, {size} MB, peak {peak / 1e6:.1f} MB",
+                    "calls": 1,
+                    "bytes": size * 1024 * 1024,
+                    "seconds": seconds,
+                })
+    finally:
+        devnull.close()
+        parent_conn.send("stop")
+        server.join()
+    return rows
+
+
+def bench_lazy_files(n_files: int = 50000) -> List[dict]:
+    """
+    Construction time and peak Python memory of a FileInfo list against a
+    FileBatch over the same local folder, and of committing each with
+    commit_files_in_chunks. Build times are measured without tracemalloc.
+
+    The server runs in a child process so that tracemalloc only sees the
+    client side.
+
+    Args:
+        n_files (int, optional): Files to commit, about 1 KB each.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as local_dir:
+        for path, content in golden_configs(n_files).items():
+            full_path = os.path.join(local_dir, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w") as f:
+                f.write(content * 3)
+
+        def file_infos():
+            files = []
+            for lazy_file in FileBatch.from_directory(local_dir):
+                with open(lazy_file.source) as f:
+                    files.append(FileInfo(
+                        file_path=lazy_file.file_path, content=f.read()
+                    ))
+            return files
+
+        builders = {
+            "FileInfo list": file_infos,
+            "FileBatch": lambda: FileBatch.from_directory(local_dir),
+        }
+        for mode, build in builders.items():
+            parent_conn, child_conn = multiprocessing.Pipe()
+            server = multiprocessing.Process(
+                target=_serve_forever, args=({}, child_conn), daemon=True
+            )
+            server.start()
+            metrics = GitlabMetrics()
+            manager = GitlabManager(
+                "token", parent_conn.recv(), PROJECT_ID, metrics=metrics
+            )
+            manager._validate_branch("main")
+            try:
+                start = time.perf_counter()
+                build()
+                seconds = time.perf_counter() - start
+                tracemalloc.start()
+                files = build()
+                peak = tracemalloc.get_traced_memory()[1]
+                rows.append({
+                    "mode": f"build {mode}, peak {peak / 1e6:.1f} MB",
+                    "calls": 0,
+                    "bytes": 0,
+                    "seconds": seconds,
+                })
+
+                tracemalloc.reset_peak()
+                metrics.reset()
+                start = time.perf_counter()
+                manager.commit_files_in_chunks(files, "bulk")
+                seconds = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                rows.append({
+                    "mode": f"commit {mode}, peak {peak / 1e6:.1f} MB",
+                    "calls": metrics.request_count(),
+                    "bytes": manager.last_bulk_commit_stats.bytes,
+                    "seconds": seconds,
+                })
+            finally:
+                del files
+                parent_conn.send("stop")
+                server.join()
+    return rows
+
+
+def call_count_suite(
+    n_files: int = 500, use_tree_index: bool = False
+) -> Dict[str, int]:
+    """
+    Runs each public GitlabManager method once on a synthetic repository
+    and returns the HTTP requests made by each.
+
+    Args:
+        n_files (int, optional): Files in the synthetic repository.
+        use_tree_index (bool, optional): Passed to GitlabManager.
+
+    Returns:
+        Dict[str, int]: method name -> HTTP requests.
+    """
+    remote = golden_configs(n_files)
+    paths = list(remote)
+    changed = [
+        FileInfo(file_path=p, content=remote[p] + "changed\n")
+        for p in paths[:10]
+    ]
+    metrics = GitlabMetrics()
+    with FakeGitlab() as fake:
+        fake.add_project(PROJECT_ID, {"main": remote})
+        manager = GitlabManager(
+            "token",
+            fake.url,
+            PROJECT_ID,
+            use_tree_index=use_tree_index,
+            metrics=metrics,
+        )
+        manager.get_file(paths[0])
+        manager.get_file_bytes(paths[0])
+        b"".join(manager.iter_file_chunks(paths[0]))
+        manager.download_file(paths[0], io.BytesIO())
+        manager.get_files(paths[:10])
+        manager.judge_file_or_folder_exist(paths[0])
+        manager.judge_file_or_folder_exist("switch_status")
+        manager.get_all_files_path_in_folder("switch_status")
+        manager.commit_files_to_gitlab(changed, "suite")
+        manager.commit_files_to_gitlab(changed, "suite", compare_by_sha=True)
+        manager.commit_files_in_chunks(changed, "suite")
+        manager.delete_file_on_gitlab(paths[-1], "suite")
+        manager.delete_folder_on_gitlab(paths[-2].rsplit("/", 1)[0], "suite")
+    return {
+        name: sum(req["count"] for req in op["requests"])
+        for name, op in metrics.to_dict()["operations"].items()
+    }
+
+
+def check_call_counts(counts: Dict[str, int], baseline_path: str) -> bool:
+    """Prints and returns False for methods above their baseline count."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    ok = True
+    for name, count in sorted(counts.items()):
+        if count > baseline.get(name, count):
+            print(f"REGRESSION {name}: {count} calls > {baseline[name]}")
+            ok = False
+    return ok
+
+
+def bench_throttled_reads(
+    n_files: int = 600,
+    limit: int = 150,
+    window: float = 3.0,
+    workers: int = 8,
+) -> List[dict]:
+    """
+    Reads files from several threads against a server that allows limit
+    requests per window, with and without a RateLimitScheduler.
+
+    Goodput is the number of successful reads per second.
+
+    Args:
+        n_files (int, optional): Files to read.
+        limit (int, optional): Requests allowed per window.
+        window (float, optional): Window length in seconds.
+        workers (int, optional): Reader threads.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    remote = golden_configs(n_files)
+    rows = []
+    for mode in ("no scheduler", "scheduler"):
+        with FakeGitlab(rate_limit=(limit, window)) as fake:
+            fake.add_project(PROJECT_ID, {"main": remote})
+            scheduler = RateLimitScheduler() if mode == "scheduler" else None
+            manager = GitlabManager(
+                "token", fake.url, PROJECT_ID, scheduler=scheduler
+            )
+
+            def read_all():
+                with ThreadPoolExecutor(workers) as pool:
+                    return list(pool.map(manager.get_file, remote))
+
+            time.sleep(window)
+            fake.reset_counters()
+            start = time.perf_counter()
+            contents = read_all()
+            seconds = time.perf_counter() - start
+            ok = sum(content is not None for content in contents)
+            rows.append({
+                "mode": (
+                    f"{mode}: {ok / seconds:.1f} reads/s goodput, "
+                    f"{fake.statuses[429]} x 429"
+                ),
+                "calls": fake.total_calls,
+                "bytes": fake.bytes_sent,
+                "seconds": seconds,
+            })
+    return rows
+
+
+def bench_stale_folder_cleanup(
+    n_folders: int = 200, files_per_folder: int = 5, latency: float = 0.002
+) -> List[dict]:
+    """
+    Deletes n_folders src_* folders one delete_folder_on_gitlab call at a
+    time, then with a single delete_paths_on_gitlab(["src_*"]).
+
+    Args:
+        n_folders (int, optional): Stale folders to delete.
+        files_per_folder (int, optional): Files in each folder.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    remote = golden_configs(100)
+    remote.update({
+        f"src_{i}/switch_status/F{j}/golden_config": "stale"
+        for i in range(n_folders)
+        for j in range(files_per_folder)
+    })
+    rows = []
+    with FakeGitlab(latency=latency) as fake:
+        for mode in ("per folder", "planner"):
+            fake.add_project(PROJECT_ID, {"main": remote})
+            manager = GitlabManager("token", fake.url, PROJECT_ID)
+            if mode == "planner":
+                func = lambda: manager.delete_paths_on_gitlab(
+                    ["src_*"], "cleanup"
+                )
+            else:
+                func = lambda: [
+                    manager.delete_folder_on_gitlab(f"src_{i}", "cleanup")
+                    for i in range(n_folders)
+                ]
+            result = _run(fake, func)
+            result["mode"] = mode
+            rows.append(result)
+    return rows
+
+
+def bench_fan_out(
+    n_projects: int = 60,
+    files_per_project: int = 20,
+    workers: List[int] = (1, 8, 16),
+    latency: float = 0.02,
+) -> List[dict]:
+    """
+    Reads a folder from every project with fan_out at several pool sizes.
+    One project does not exist to show partial failures.
+
+    Args:
+        n_projects (int, optional): Projects to read.
+        files_per_project (int, optional): Files per project.
+        workers (List[int], optional): Pool sizes to compare.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row per pool size.
+    """
+    remote = golden_configs(files_per_project)
+    rows = []
+    with FakeGitlab(latency=latency) as fake:
+        for project_id in range(1, n_projects):
+            fake.add_project(project_id, {"main": remote})
+        for max_workers in workers:
+            results = {}
+
+            def run():
+                results.update(fan_out(
+                    range(1, n_projects + 1),
+                    read_folder("switch_status"),
+                    "token",
+                    fake.url,
+                    max_workers=max_workers,
+                ))
+
+            result = _run(fake, run)
+            failed = [r.project_id for r in results.values() if not r.ok]
+            result["mode"] = f"{max_workers} workers, failed: {failed}"
+            rows.append(result)
+    return rows
+
+
+def bench_conditional_polling(
+    n_files: int = 300, polls: int = 5, latency: float = 0.002
+) -> List[dict]:
+    """
+    Polls a folder (listing plus every file) several times while one file
+    changes between polls, with and without a ConditionalCache.
+
+    Args:
+        n_files (int, optional): Files in the folder.
+        polls (int, optional): Polls after the first full read.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row per mode.
+    """
+    remote = golden_configs(n_files)
+    changed = next(iter(remote))
+    rows = []
+    for conditional_cache in (None, ConditionalCache()):
+        with FakeGitlab(latency=latency) as fake:
+            fake.add_project(PROJECT_ID, {"main": remote})
+            manager = GitlabManager(
+                "token",
+                fake.url,
+                PROJECT_ID,
+                conditional_cache=conditional_cache,
+            )
+
+            def poll():
+                for path in manager.get_all_files_path_in_folder(
+                    "switch_status"
+                ):
+                    manager.get_file(path)
+
+            poll()
+
+            def run():
+                for version in range(1, polls + 1):
+                    fake.projects[str(PROJECT_ID)]["main"][changed] = (
+                        f"hostname changed {version}\n".encode()
+                    )
+                    poll()
+
+            result = _run(fake, run)
+            mode = "conditional" if conditional_cache else "plain"
+            result["mode"] = f"{mode}, 304 answers: {fake.statuses[304]}"
+            rows.append(result)
+    return rows
+
+
+def bench_sync_directory(
+    n_files: int = 2000, latency: float = 0.002
+) -> List[dict]:
+    """
+    Syncs a local folder to a branch after some files changed, were added,
+    removed and renamed locally, then syncs again with nothing changed,
+    also with a warm tree index.
+
+    Args:
+        n_files (int, optional): Files in the folder.
+        latency (float, optional): Simulated server latency per request.
+
+    Returns:
+        List[dict]: One result row per sync.
+    """
+    remote = golden_configs(n_files)
+    local = dict(golden_configs(n_files))
+    paths = list(remote)
+    for path in paths[:50]:
+        local[path] = local[path] + "description changed\n"
+    for path in paths[50:100]:
+        del local[path]
+    for path in paths[100:150]:
+        local[path.replace("switch_status", "moved")] = local.pop(path)
+    for i in range(50):
+        local[f"switch_status/N{i:05d}/golden_config"] = f"hostname N{i}\n"
+
+    rows = []
+    with tempfile.TemporaryDirectory() as local_dir:
+        for path, content in local.items():
+            full_path = os.path.join(local_dir, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w") as f:
+                f.write(content)
+
+        with FakeGitlab(latency=latency) as fake:
+            fake.add_project(PROJECT_ID, {"main": remote})
+            manager = GitlabManager("token", fake.url, PROJECT_ID)
+            manager._validate_branch("main")
+            for mode in ("changes", "no changes"):
+                result = _run(
+                    fake, lambda: manager.sync_directory(local_dir)
+                )
+                result["mode"] = mode
+                rows.append(result)
+
+            manager = GitlabManager(
+                "token", fake.url, PROJECT_ID, use_tree_index=True
+            )
+            manager.sync_directory(local_dir)
+            result = _run(fake, lambda: manager.sync_directory(local_dir))
+            result["mode"] = "no changes, warm tree index"
+            rows.append(result)
+    return rows
+
+
+def print_rows(title: str, rows: List[dict]):
+    print(f"== {title}")
+    for row in rows:
+        print(
+            f"calls={row['calls']:<7} bytes={row['bytes']:<10} "
+            f"seconds={row['seconds']:<8.3f} {row['mode']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--in-flight", type=int, default=16)
+    parser.add_argument(
+        "--suite",
+        action="store_true",
+        help="only run the per-method call count suite",
+    )
+    parser.add_argument("--baseline", help="JSON of allowed call counts")
+    parser.add_argument("--write-baseline", help="save call counts here")
+    args = parser.parse_args()
+
+    if args.suite:
+        counts = call_count_suite(args.files)
+        print(json.dumps(counts, indent=4, sort_keys=True))
+        if args.write_baseline:
+            with open(args.write_baseline, "w") as f:
+                json.dump(counts, f, indent=4, sort_keys=True)
+        if args.baseline and not check_call_counts(counts, args.baseline):
+            sys.exit(1)
+        sys.exit(0)
+
+    print_rows(
+        f"commit_files_to_gitlab, {args.files} files",
+        bench_commit_compare(args.files, latency=args.latency),
+    )
+    print_rows(
+        f"bulk reads, {args.files} files",
+        bench_bulk_reads(args.files, args.in_flight, latency=args.latency),
+    )
+    print_rows(
+        f"get_file with BlobCache, {args.files} files",
+        bench_cached_reads(args.files, latency=args.latency),
+    )
+    print_rows(
+        f"path lookups, {args.files} files",
+        bench_path_lookups(args.files, latency=args.latency),
+    )
+    print_rows(
+        f"commit_files_in_chunks, {args.files} files",
+        bench_chunked_commit(args.files, latency=args.latency),
+    )
+    print_rows(
+        "cold start, 2000 branches",
+        bench_cold_start(latency=args.latency),
+    )
+    print_rows("large file reads", bench_large_file_reads())
+    print_rows("FileInfo list vs FileBatch, 50k files", bench_lazy_files())
+    print_rows(
+        "throttled reads, 150 requests per 3 s",
+        bench_throttled_reads(),
+    )
+    print_rows(
+        "stale folder cleanup, 200 src_* folders",
+        bench_stale_folder_cleanup(latency=args.latency),
+    )
+    print_rows(
+        "fan-out over 60 projects, 20 ms latency",
+        bench_fan_out(),
+    )
+    print_rows(
+        "polling 300 files, 5 polls, one change per poll",
+        bench_conditional_polling(latency=args.latency),
+    )
+    print_rows(
+        f"sync_directory, {args.files} files",
+        bench_sync_directory(args.files, latency=args.latency),
+    )
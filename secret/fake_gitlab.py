@@ -0,0 +1,455 @@
+"""Local stand-in for the part of the GitLab REST API used by GitlabManager.
+
+Only the endpoints that GitlabManager touches are implemented, and only as
+far as python-gitlab needs them. Every request is counted so benchmarks can
+compare API call counts between strategies.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+def _blob_id(data: bytes) -> str:
+    return hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+
+
+class FakeGitlabError(Exception):
+    """Carries an HTTP status and message back to the request handler."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class FakeGitlab:
+    """
+    In-memory GitLab projects served over HTTP on 127.0.0.1.
+
+    Args:
+        latency (float, optional): Seconds to sleep before answering each
+            request, to mimic a remote server. Defaults to 0.
+        rate_limit (Tuple[int, float], optional): Allow this many requests
+            per window of this many seconds and answer 429 with Retry-After
+            beyond it. Every response carries RateLimit-* headers.
+            Defaults to None (no limit).
+        count_limit (int, optional): Lists longer than this are sent
+            without X-Total and X-Total-Pages, as GitLab does, so clients
+            must follow X-Next-Page or Link. Defaults to 10000.
+
+    Attributes:
+        projects (dict): project id -> branch name -> path -> file bytes.
+        heads (dict): (project id, branch) -> head commit SHA.
+        calls (Counter): Request counts keyed by "METHOD route".
+        statuses (Counter): Response counts keyed by HTTP status.
+            GET responses carry an ETag and a matching If-None-Match is
+            answered with 304 and no body.
+        bytes_sent (int): Total response body bytes sent.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        rate_limit: Optional[Tuple[int, float]] = None,
+        count_limit: int = 10_000,
+    ):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.count_limit = count_limit
+        self.statuses: Counter = Counter()
+        self._window_start = 0.0
+        self._window_count = 0
+        self.projects: Dict[str, Dict[str, Dict[str, bytes]]] = {}
+        self.heads: Dict[Tuple[str, str], str] = {}
+        self.calls: Counter = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.RLock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGitlab":
+        handler = type("Handler", (_FakeGitlabHandler,), {"fake": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeGitlab":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def add_project(
+        self,
+        project_id,
+        branches: Optional[Dict[str, Dict[str, str]]] = None,
+    ):
+        """
+        Creates a project, replacing any project with the same id.
+
+        Args:
+            project_id: The project id as used in API paths.
+            branches (dict, optional): branch name -> path -> content.
+                Defaults to a single empty "main" branch.
+        """
+        branches = branches or {"main": {}}
+        with self._lock:
+            pid = str(project_id)
+            self.projects[pid] = {}
+            for name, files in branches.items():
+                self.projects[pid][name] = {
+                    path: (
+                        content.encode()
+                        if isinstance(content, str)
+                        else content
+                    )
+                    for path, content in files.items()
+                }
+                self._advance_head(pid, name)
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.statuses.clear()
+            self.bytes_sent = 0
+
+    def _rate_limit_headers(self) -> Tuple[bool, Dict[str, str]]:
+        """Counts a request against the window, returns (allowed, headers)."""
+        limit, window = self.rate_limit
+        now = time.time()
+        with self._lock:
+            if now - self._window_start >= window:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            reset = self._window_start + window
+            allowed = self._window_count <= limit
+            headers = {
+                "RateLimit-Limit": str(limit),
+                "RateLimit-Observed": str(self._window_count),
+                "RateLimit-Remaining": str(max(limit - self._window_count, 0)),
+                "RateLimit-Reset": str(math.ceil(reset)),
+            }
+        if not allowed:
+            headers["Retry-After"] = str(max(math.ceil(reset - now), 1))
+        return allowed, headers
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def _advance_head(self, pid: str, branch: str):
+        previous = self.heads.get((pid, branch), "")
+        self.heads[(pid, branch)] = hashlib.sha1(
+            f"{pid}:{branch}:{previous}:{time.monotonic_ns()}".encode()
+        ).hexdigest()
+
+    def _files(self, pid: str, branch: str) -> Dict[str, bytes]:
+        if pid not in self.projects:
+            raise FakeGitlabError(404, "404 Project Not Found")
+        # Only the current head commit of a branch can be used as a ref
+        for (head_pid, name), head in self.heads.items():
+            if head_pid == pid and head == branch:
+                branch = name
+        if branch not in self.projects[pid]:
+            raise FakeGitlabError(404, "404 Branch Not Found")
+        return self.projects[pid][branch]
+
+    def tree(
+        self, pid: str, branch: str, path: str, recursive: bool
+    ) -> List[dict]:
+        files = self._files(pid, branch)
+        prefix = path.strip("/")
+        if prefix and prefix in files:
+            return []
+        base = prefix + "/" if prefix else ""
+        entries: Dict[str, dict] = {}
+        for file_path, data in files.items():
+            if not file_path.startswith(base):
+                continue
+            parts = file_path[len(base):].split("/")
+            depth = len(parts) - 1 if recursive else min(len(parts) - 1, 1)
+            for level in range(1, depth + 1):
+                tree_path = base + "/".join(parts[:level])
+                entries.setdefault(tree_path, {
+                    "id": hashlib.sha1(tree_path.encode()).hexdigest(),
+                    "name": parts[level - 1],
+                    "type": "tree",
+                    "path": tree_path,
+                    "mode": "040000",
+                })
+            if recursive or len(parts) == 1:
+                entries[file_path] = {
+                    "id": _blob_id(data),
+                    "name": parts[-1],
+                    "type": "blob",
+                    "path": file_path,
+                    "mode": "100644",
+                }
+        if prefix and not entries:
+            raise FakeGitlabError(404, "404 Tree Not Found")
+        return [entries[key] for key in sorted(entries)]
+
+    def commit(self, pid: str, body: dict) -> dict:
+        branch = body.get("branch")
+        files = self._files(pid, branch)
+        staged = dict(files)
+        for action in body.get("actions", []):
+            kind = action.get("action")
+            path = action.get("file_path")
+            content = action.get("content", "")
+            if action.get("encoding") == "base64":
+                data = base64.b64decode(content)
+            else:
+                data = content.encode()
+            if kind == "create":
+                if path in staged:
+                    raise FakeGitlabError(
+                        400, "A file with this name already exists"
+                    )
+                staged[path] = data
+            elif kind == "update":
+                if path not in staged:
+                    raise FakeGitlabError(
+                        400, "A file with this name doesn't exist"
+                    )
+                staged[path] = data
+            elif kind == "delete":
+                if path not in staged:
+                    raise FakeGitlabError(
+                        400, "A file with this name doesn't exist"
+                    )
+                del staged[path]
+            elif kind == "move":
+                previous = action.get("previous_path")
+                if previous not in staged or path in staged:
+                    raise FakeGitlabError(400, "Invalid move")
+                moved = staged.pop(previous)
+                staged[path] = data if "content" in action else moved
+            else:
+                raise FakeGitlabError(400, f"Unknown action '{kind}'")
+        files.clear()
+        files.update(staged)
+        self._advance_head(pid, branch)
+        return {"id": self.heads[(pid, branch)], "message": body.get(
+            "commit_message", ""
+        )}
+
+
+class _FakeGitlabHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024
+    fake: FakeGitlab
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_HEAD(self):
+        self._dispatch("HEAD")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str):
+        fake = self.fake
+        if fake.latency:
+            time.sleep(fake.latency)
+        split = urlsplit(self.path)
+        segments = [unquote(s) for s in split.path.split("/")[3:]]
+        query = {k: v[-1] for k, v in parse_qs(split.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        body = {}
+        if raw_body:
+            try:
+                body = json.loads(raw_body)
+            except ValueError:
+                body = {k: v[-1] for k, v in parse_qs(
+                    raw_body.decode()
+                ).items()}
+        rest = segments[2:]
+        route = self._route_name(rest)
+        allowed, limit_headers = True, {}
+        if fake.rate_limit:
+            allowed, limit_headers = fake._rate_limit_headers()
+        try:
+            if not allowed:
+                raise FakeGitlabError(429, "Retry later")
+            if len(segments) < 2 or segments[0] != "projects":
+                raise FakeGitlabError(404, "404 Not Found")
+            status, payload, headers = self._route(
+                method, segments[1], rest, query, body
+            )
+        except FakeGitlabError as e:
+            status, payload, headers = e.status, {"message": e.message}, {}
+        headers.update(limit_headers)
+        with fake._lock:
+            fake.calls[f"{method} {route}"] += 1
+        self._send(method, status, payload, headers)
+
+    @staticmethod
+    def _route_name(rest: List[str]) -> str:
+        if not rest:
+            return "project"
+        if rest[:2] == ["repository", "branches"]:
+            return "branches" if len(rest) == 2 else "branch"
+        if rest[:2] == ["repository", "files"]:
+            return "raw" if len(rest) > 3 and rest[-1] == "raw" else "files"
+        return rest[1] if len(rest) > 1 else rest[0]
+
+    def _route(self, method, pid, rest, query, body):
+        fake = self.fake
+        with fake._lock:
+            if pid not in fake.projects:
+                raise FakeGitlabError(404, "404 Project Not Found")
+            default = "main" if "main" in fake.projects[pid] else next(
+                iter(fake.projects[pid])
+            )
+            if not rest:
+                return 200, {
+                    "id": pid,
+                    "default_branch": default,
+                }, {}
+            if rest[:2] == ["repository", "branches"]:
+                if len(rest) == 2:
+                    names = sorted(fake.projects[pid])
+                    payload = [
+                        {"name": n, "commit": {"id": fake.heads[(pid, n)]}}
+                        for n in names
+                    ]
+                    return self._paginate(payload, query)
+                name = "/".join(rest[2:])
+                fake._files(pid, name)
+                return 200, {
+                    "name": name,
+                    "commit": {"id": fake.heads[(pid, name)]},
+                }, {}
+            if rest[:2] == ["repository", "tree"]:
+                entries = fake.tree(
+                    pid,
+                    query.get("ref", default),
+                    query.get("path", ""),
+                    query.get("recursive", "").lower() == "true",
+                )
+                return self._paginate(entries, query)
+            if rest[:2] == ["repository", "commits"] and method == "POST":
+                return 201, fake.commit(pid, body), {}
+            if rest[:2] == ["repository", "files"] and len(rest) >= 3:
+                return self._route_file(method, pid, rest[2:], query, body)
+        raise FakeGitlabError(404, "404 Not Found")
+
+    def _route_file(self, method, pid, rest, query, body):
+        fake = self.fake
+        raw = rest[-1] == "raw" and len(rest) > 1
+        path = "/".join(rest[:-1] if raw else rest)
+        if method == "DELETE":
+            fake.commit(pid, {
+                "branch": body.get("branch") or query.get("branch"),
+                "actions": [{"action": "delete", "file_path": path}],
+            })
+            return 204, None, {}
+        ref = query.get("ref", "main")
+        files = fake._files(pid, ref)
+        if path not in files:
+            raise FakeGitlabError(404, "404 File Not Found")
+        data = files[path]
+        headers = {
+            "X-Gitlab-Blob-Id": _blob_id(data),
+            "X-Gitlab-File-Path": path,
+            "X-Gitlab-Ref": ref,
+            "X-Gitlab-Size": str(len(data)),
+            "X-Gitlab-Commit-Id": fake.heads[(pid, ref)],
+        }
+        if raw:
+            return 200, data, headers
+        return 200, {
+            "file_name": path.rsplit("/", 1)[-1],
+            "file_path": path,
+            "size": len(data),
+            "encoding": "base64",
+            "content": base64.b64encode(data).decode(),
+            "content_sha256": hashlib.sha256(data).hexdigest(),
+            "ref": ref,
+            "blob_id": _blob_id(data),
+            "commit_id": fake.heads[(pid, ref)],
+            "last_commit_id": fake.heads[(pid, ref)],
+        }, headers
+
+    def _paginate(self, items: list, query: dict):
+        per_page = min(int(query.get("per_page", 20)), 100)
+        page = max(int(query.get("page", 1)), 1)
+        total_pages = max((len(items) + per_page - 1) // per_page, 1)
+        headers = {"X-Page": str(page), "X-Per-Page": str(per_page)}
+        if len(items) <= self.fake.count_limit:
+            headers["X-Total"] = str(len(items))
+            headers["X-Total-Pages"] = str(total_pages)
+        if page < total_pages:
+            headers["X-Next-Page"] = str(page + 1)
+            split = urlsplit(self.path)
+            params = parse_qs(split.query)
+            params["page"] = [str(page + 1)]
+            params["per_page"] = [str(per_page)]
+            qs = "&".join(
+                f"{k}={v[-1]}" for k, v in sorted(params.items())
+            )
+            host = self.headers.get("Host", "127.0.0.1")
+            headers["Link"] = (
+                f'<http://{host}{split.path}?{qs}>; rel="next"'
+            )
+        start = (page - 1) * per_page
+        return 200, items[start:start + per_page], headers
+
+    def _send(self, method, status, payload, headers):
+        if payload is None:
+            data = b""
+        elif isinstance(payload, bytes):
+            data = payload
+            headers.setdefault("Content-Type", "application/octet-stream")
+        else:
+            data = json.dumps(payload).encode()
+            headers.setdefault("Content-Type", "application/json")
+        if method == "GET" and status == 200:
+            headers["ETag"] = f'W/"{hashlib.sha1(data).hexdigest()}"'
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                status, data = 304, b""
+        with self.fake._lock:
+            self.fake.statuses[status] += 1
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if method != "HEAD" and data:
+            self.wfile.write(data)
+            with self.fake._lock:
+                self.fake.bytes_sent += len(data)
@@ -0,0 +1,152 @@
+"""Run one GitlabManager operation over many projects concurrently."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from gitlab import Gitlab
+from pydantic import BaseModel
+
+from gitlab_http import (
+    ConditionalCache,
+    GitlabAdapter,
+    GitlabMetrics,
+    RateLimitScheduler,
+)
+from gitlabs import FileInfo, GitlabManager
+
+
+class ProjectResult(BaseModel):
+    """
+    Outcome of an operation on one project.
+
+    Attributes:
+        project_id (str): The ID of the GitLab project.
+        ok (bool): False if the operation raised or returned False.
+        result (Any): The return value of the operation.
+        error (str, optional): The exception, if one was raised.
+        seconds (float): Wall time of the operation.
+    """
+
+    project_id: str
+    ok: bool
+    result: Any = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+def read_folder(
+    folder_path: str = "", branch: str = "main"
+) -> Callable[[GitlabManager], Dict[str, Optional[str]]]:
+    """Operation reading every file below folder_path."""
+
+    def operation(manager: GitlabManager) -> Dict[str, Optional[str]]:
+        paths = manager.get_all_files_path_in_folder(folder_path, branch)
+        return manager.get_files(paths, branch)
+
+    return operation
+
+
+def commit_files(
+    files: List[FileInfo], commit_message: str, branch: str = "main"
+) -> Callable[[GitlabManager], bool]:
+    """Operation committing the same file set to each project."""
+
+    def operation(manager: GitlabManager) -> bool:
+        return manager.commit_files_to_gitlab(
+            files, commit_message, branch, compare_by_sha=True
+        )
+
+    return operation
+
+
+def delete_paths(
+    patterns: List[str], commit_message: str, branch: str = "main"
+) -> Callable[[GitlabManager], bool]:
+    """Operation deleting files, folders and globs in each project."""
+
+    def operation(manager: GitlabManager) -> bool:
+        return manager.delete_paths_on_gitlab(
+            patterns, commit_message, branch
+        )
+
+    return operation
+
+
+def fan_out(
+    project_ids: Iterable,
+    operation: Callable[[GitlabManager], Any],
+    token: str,
+    base_url: str,
+    max_workers: int = 8,
+    scheduler: Optional[RateLimitScheduler] = None,
+    metrics: Optional[GitlabMetrics] = None,
+    conditional_cache: Optional[ConditionalCache] = None,
+    **manager_kwargs,
+) -> Dict[str, ProjectResult]:
+    """
+    Runs operation on a GitlabManager for each project in a thread pool.
+
+    All managers share one Gitlab client, so one HTTP connection pool, and
+    the optional scheduler, so one rate-limit budget. A failure in one
+    project is reported in its ProjectResult and does not stop the others.
+
+    Args:
+        project_ids (Iterable): The IDs of the GitLab projects.
+        operation (Callable[[GitlabManager], Any]): Work for one project,
+            e.g. read_folder(), commit_files() or delete_paths().
+        token (str): The GitLab access token.
+        base_url (str): The base URL of the GitLab instance.
+        max_workers (int, optional): Projects run at once. Defaults to 8.
+        scheduler (RateLimitScheduler, optional): Shared request pacing.
+        metrics (GitlabMetrics, optional): Shared request metrics.
+        conditional_cache (ConditionalCache, optional): Shared validators,
+            useful when fan_out is called repeatedly to poll.
+        **manager_kwargs: Passed on to each GitlabManager.
+
+    Returns:
+        Dict[str, ProjectResult]: project id -> result, in input order.
+    """
+    gl = Gitlab(base_url, private_token=token)
+    GitlabAdapter(
+        metrics=metrics,
+        scheduler=scheduler,
+        conditional_cache=conditional_cache,
+        pool_connections=max_workers,
+        pool_maxsize=max_workers,
+    ).mount(gl.session)
+
+    def run(project_id) -> ProjectResult:
+        start = time.perf_counter()
+        try:
+            manager = GitlabManager(
+                token,
+                base_url,
+                project_id,
+                metrics=metrics,
+                gl=gl,
+                **manager_kwargs,
+            )
+            result = operation(manager)
+            return ProjectResult(
+                project_id=str(project_id),
+                ok=result is not False,
+                result=result,
+                seconds=time.perf_counter() - start,
+            )
+        except Exception as e:
+            print(f"Error running operation on project {project_id}: {e}")
+            return ProjectResult(
+                project_id=str(project_id),
+                ok=False,
+                error=repr(e),
+                seconds=time.perf_counter() - start,
+            )
+
+    project_ids = list(project_ids)
+    try:
+        with ThreadPoolExecutor(max_workers) as pool:
+            results = list(pool.map(run, project_ids))
+    finally:
+        gl.session.close()
+    return {result.project_id: result for result in results}
@@ -0,0 +1,606 @@
+"""HTTP layer hooks for the requests session python-gitlab uses."""
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+_current_operation: contextvars.ContextVar = contextvars.ContextVar(
+    "gitlab_operation", default=None
+)
+
+RATE_LIMIT_HEADERS = {
+    "RateLimit-Limit": "limit",
+    "RateLimit-Remaining": "remaining",
+    "RateLimit-Reset": "reset",
+}
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus layout.
+
+    Args:
+        buckets (Tuple[float, ...]): Sorted upper bounds.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        cumulative, total = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = total
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+class GitlabMetrics:
+    """
+    Collects per-operation call counts, HTTP request counts, latency
+    histograms, payload bytes and the last rate-limit header values.
+
+    GitlabManager reports each public method as an operation, and every
+    HTTP request sent while it runs is attributed to it. Nested operations
+    are attributed to the outermost one. errors counts operations that
+    raised, http_errors counts responses with a status of 400 or more.
+
+    Args:
+        buckets (Tuple[float, ...], optional): Latency bucket bounds in
+            seconds.
+    """
+
+    DEFAULT_BUCKETS = (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+    )
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.operations: Dict[str, int] = defaultdict(int)
+            self.operation_errors: Dict[str, int] = defaultdict(int)
+            self.operation_latency: Dict[str, Histogram] = {}
+            self.requests: Dict[Tuple[str, str, int], int] = defaultdict(int)
+            self.request_latency: Dict[str, Histogram] = {}
+            self.request_bytes: Dict[str, int] = defaultdict(int)
+            self.response_bytes: Dict[str, int] = defaultdict(int)
+            self.rate_limit: Dict[str, float] = {}
+
+    def _histogram(self, table: dict, key: str) -> Histogram:
+        if key not in table:
+            table[key] = Histogram(self.buckets)
+        return table[key]
+
+    @contextmanager
+    def operation(self, name: str) -> Iterator[None]:
+        """Attributes the HTTP requests made inside the block to name."""
+        if _current_operation.get() is not None:
+            yield
+            return
+        token = _current_operation.set(name)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            _current_operation.reset(token)
+            with self._lock:
+                self.operations[name] += 1
+                if failed:
+                    self.operation_errors[name] += 1
+                self._histogram(self.operation_latency, name).observe(
+                    time.perf_counter() - start
+                )
+
+    def record_request(
+        self,
+        method: str,
+        status: int,
+        seconds: float,
+        request_bytes: int,
+        response_bytes: int,
+        headers: Optional[dict] = None,
+    ):
+        operation = _current_operation.get() or "other"
+        with self._lock:
+            self.requests[(operation, method, status)] += 1
+            self._histogram(self.request_latency, operation).observe(seconds)
+            self.request_bytes[operation] += request_bytes
+            self.response_bytes[operation] += response_bytes
+            for header, key in RATE_LIMIT_HEADERS.items():
+                if headers and header in headers:
+                    self.rate_limit[key] = float(headers[header])
+
+    def record_response_bytes(self, operation: str, response_bytes: int):
+        """Adds body bytes read after their request was recorded."""
+        with self._lock:
+            self.response_bytes[operation] += response_bytes
+
+    def request_count(self, operation: Optional[str] = None) -> int:
+        """Number of HTTP requests, for one operation or in total."""
+        with self._lock:
+            return sum(
+                count
+                for (op, _, _), count in self.requests.items()
+                if operation is None or op == operation
+            )
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            requests_by_op: Dict[str, List[dict]] = defaultdict(list)
+            for (op, method, status), count in sorted(self.requests.items()):
+                requests_by_op[op].append(
+                    {"method": method, "status": status, "count": count}
+                )
+            names = set(self.operations) | set(requests_by_op)
+            return {
+                "operations": {
+                    name: {
+                        "calls": self.operations.get(name, 0),
+                        "errors": self.operation_errors.get(name, 0),
+                        "http_errors": sum(
+                            req["count"]
+                            for req in requests_by_op.get(name, [])
+                            if req["status"] >= 400
+                        ),
+                        "latency": self.operation_latency[name].to_dict()
+                        if name in self.operation_latency
+                        else None,
+                        "requests": requests_by_op.get(name, []),
+                        "request_latency": self.request_latency[
+                            name
+                        ].to_dict()
+                        if name in self.request_latency
+                        else None,
+                        "request_bytes": self.request_bytes.get(name, 0),
+                        "response_bytes": self.response_bytes.get(name, 0),
+                    }
+                    for name in sorted(names)
+                },
+                "rate_limit": dict(self.rate_limit),
+            }
+
+    def to_prometheus(self, prefix: str = "gitlab") -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        data = self.to_dict()
+        families: Dict[str, Tuple[str, List[str]]] = {}
+
+        def sample(name: str, kind: str, labels: str, value):
+            name = f"{prefix}_{name}"
+            families.setdefault(name, (kind, []))[1].append(
+                f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+            )
+
+        def histogram(name: str, labels: str, hist: Optional[dict]):
+            if hist is None:
+                return
+            full = f"{prefix}_{name}"
+            kind, lines = families.setdefault(full, ("histogram", []))
+            for bound, count in hist["buckets"].items():
+                lines.append(f'{full}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{full}_sum{{{labels}}} {hist['sum']}")
+            lines.append(f"{full}_count{{{labels}}} {hist['count']}")
+
+        for name, op in data["operations"].items():
+            label = f'operation="{name}"'
+            sample("operation_calls_total", "counter", label, op["calls"])
+            sample("operation_errors_total", "counter", label, op["errors"])
+            sample("http_errors_total", "counter", label, op["http_errors"])
+            histogram("operation_duration_seconds", label, op["latency"])
+            for req in op["requests"]:
+                sample(
+                    "http_requests_total",
+                    "counter",
+                    f'{label},method="{req["method"]}",'
+                    f'status="{req["status"]}"',
+                    req["count"],
+                )
+            histogram(
+                "http_request_duration_seconds", label, op["request_latency"]
+            )
+            sample(
+                "http_request_bytes_total", "counter", label,
+                op["request_bytes"],
+            )
+            sample(
+                "http_response_bytes_total", "counter", label,
+                op["response_bytes"],
+            )
+        for key, value in data["rate_limit"].items():
+            sample(f"ratelimit_{key}", "gauge", "", value)
+
+        out = []
+        for name, (kind, lines) in families.items():
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+class RateLimitScheduler:
+    """
+    Paces requests to stay just below the GitLab rate limit.
+
+    A token bucket spaces requests at rate per second, and at most
+    concurrency requests are in flight. After each response the rate is set
+    from RateLimit-Remaining spread over the time left until
+    RateLimit-Reset (times headroom), and concurrency grows by one while the
+    remaining budget is comfortable and shrinks by one when it runs low.
+    A 429 halves concurrency and the rate and blocks every caller until
+    Retry-After has passed, given in seconds or as an HTTP date (one second
+    if it is missing or cannot be parsed).
+
+    One scheduler can be shared by several GitlabManager instances so that
+    they draw from the same budget.
+
+    Args:
+        max_rate (float, optional): Upper bound of requests per second.
+            Defaults to 50.
+        max_concurrency (int, optional): Upper bound of requests in flight.
+            Defaults to 8.
+        min_rate (float, optional): Lower bound of requests per second.
+            Defaults to 0.5.
+        headroom (float, optional): Share of the announced budget to use.
+            Defaults to 0.9.
+        max_retries (int, optional): Times a 429 is retried before it is
+            returned to the caller. Defaults to 5.
+
+    Attributes:
+        rate (float): Current requests per second.
+        concurrency (int): Current in-flight limit.
+        sent (int): Requests sent.
+        throttled (int): 429 responses received.
+    """
+
+    def __init__(
+        self,
+        max_rate: float = 50.0,
+        max_concurrency: int = 8,
+        min_rate: float = 0.5,
+        headroom: float = 0.9,
+        max_retries: int = 5,
+    ):
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.headroom = headroom
+        self.max_retries = max_retries
+        self.rate = max_rate
+        self.concurrency = max_concurrency
+        self.sent = 0
+        self.throttled = 0
+        self._tokens = float(max_concurrency)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def _take_token(self, now: float) -> float:
+        """Takes a token, or returns the seconds until one is available."""
+        burst = float(self.concurrency)
+        self._tokens = min(
+            burst, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._in_flight >= self.concurrency:
+                    wait = None
+                else:
+                    wait = self._take_token(now)
+                    if not wait:
+                        self._in_flight += 1
+                        self.sent += 1
+                        return
+                self._cond.wait(wait)
+
+    def release(self, status: int, headers: Optional[dict] = None):
+        """Frees the slot of a finished request and adapts to its headers."""
+        headers = headers or {}
+        with self._cond:
+            self._in_flight -= 1
+            if status == 429:
+                self._throttle(headers)
+            else:
+                self._adapt(headers)
+            self._cond.notify_all()
+
+    def _throttle(self, headers: dict):
+        self.throttled += 1
+        retry_after = self._retry_after(headers.get("Retry-After"))
+        self._blocked_until = max(
+            self._blocked_until, time.monotonic() + retry_after
+        )
+        self.concurrency = max(1, self.concurrency // 2)
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    @staticmethod
+    def _retry_after(value: Optional[str], default: float = 1.0) -> float:
+        """Seconds to wait from Retry-After, in seconds or HTTP-date form."""
+        if not value:
+            return default
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+        if date.tzinfo is None:  # "-0000" zone, HTTP dates are in GMT
+            date = date.replace(tzinfo=timezone.utc)
+        return max(0.0, date.timestamp() - time.time())
+
+    def _adapt(self, headers: dict):
+        remaining = headers.get("RateLimit-Remaining")
+        reset = headers.get("RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        remaining = int(remaining)
+        window = max(float(reset) - time.time(), 1.0)
+        self.rate = min(
+            self.max_rate,
+            max(self.min_rate, remaining * self.headroom / window),
+        )
+        if remaining > 2 * self.concurrency:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+        else:
+            self.concurrency = max(1, self.concurrency - 1)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "rate": self.rate,
+                "concurrency": self.concurrency,
+                "sent": self.sent,
+                "throttled": self.throttled,
+            }
+
+
+class ConditionalCache:
+    """
+    Remembers the validators and body of GET responses and turns repeated
+    GETs into conditional requests.
+
+    A response carrying an ETag or Last-Modified header is stored by URL.
+    The next GET of that URL sends If-None-Match / If-Modified-Since, and a
+    304 answer is replaced by the stored body with status 200, so callers
+    see no difference. Streamed requests are left alone.
+
+    Args:
+        max_bytes (int, optional): Size bound of the stored bodies, least
+            recently used entries are dropped first. Defaults to 64 MiB.
+
+    Attributes:
+        full (int): GETs answered with a full body.
+        not_modified (int): GETs answered with 304.
+        bytes_saved (int): Body bytes served from the cache.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.full = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, request: requests.PreparedRequest):
+        """Adds the stored validators of request.url to its headers."""
+        with self._lock:
+            entry = self._entries.get(request.url)
+        if entry is None:
+            return
+        if entry["etag"]:
+            request.headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            request.headers["If-Modified-Since"] = entry["last_modified"]
+
+    def process(
+        self, request: requests.PreparedRequest, response: requests.Response
+    ) -> requests.Response:
+        """Stores a full response, or answers a 304 from the store."""
+        url = request.url
+        if response.status_code == 304:
+            with self._lock:
+                entry = self._entries.get(url)
+                if entry is None:
+                    return response
+                self._entries.move_to_end(url)
+                self.not_modified += 1
+                self.bytes_saved += len(entry["content"])
+            cached = requests.Response()
+            cached.status_code = 200
+            cached.reason = "OK"
+            cached._content = entry["content"]
+            cached.headers = CaseInsensitiveDict(entry["headers"])
+            cached.headers.update(response.headers)
+            cached.headers["Content-Length"] = str(len(entry["content"]))
+            cached.url = response.url
+            cached.request = request
+            cached.connection = response.connection
+            cached.encoding = response.encoding
+            cached.elapsed = response.elapsed
+            response.close()
+            return cached
+
+        if response.status_code != 200:
+            return response
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self._lock:
+            self.full += 1
+        if not etag and not last_modified:
+            return response
+        content = response.content
+        if len(content) > self.max_bytes:
+            return response
+        with self._lock:
+            previous = self._entries.pop(url, None)
+            if previous is not None:
+                self._size -= len(previous["content"])
+            self._entries[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "content": content,
+                "headers": dict(response.headers),
+            }
+            self._size += len(content)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted["content"])
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "full": self.full,
+                "not_modified": self.not_modified,
+                "bytes_saved": self.bytes_saved,
+                "entries": len(self._entries),
+            }
+
+
+class GitlabAdapter(HTTPAdapter):
+    """
+    requests transport adapter that paces every request through a
+    RateLimitScheduler, reports it to a GitlabMetrics and makes repeated
+    GETs conditional through a ConditionalCache.
+
+    429 responses are retried by the adapter up to scheduler.max_retries
+    times once the scheduler lets requests through again.
+
+    Args:
+        metrics (GitlabMetrics, optional): Where requests are recorded.
+        scheduler (RateLimitScheduler, optional): Paces the requests.
+        conditional_cache (ConditionalCache, optional): Validators and
+            bodies of earlier GETs.
+        **kwargs: Passed on to HTTPAdapter (pool sizes, retries).
+    """
+
+    def __init__(
+        self,
+        metrics: Optional[GitlabMetrics] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
+        conditional_cache: Optional[ConditionalCache] = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.conditional_cache = conditional_cache
+
+    def mount(self, session: requests.Session) -> "GitlabAdapter":
+        session.mount("http://", self)
+        session.mount("https://", self)
+        return self
+
+    def send(self, request: requests.PreparedRequest, **kwargs):
+        conditional = (
+            self.conditional_cache is not None
+            and request.method == "GET"
+            and not kwargs.get("stream")
+        )
+        if conditional:
+            self.conditional_cache.prepare(request)
+        retries = 0
+        while True:
+            response = self._send_once(request, **kwargs)
+            if (
+                response.status_code != 429
+                or self.scheduler is None
+                or retries >= self.scheduler.max_retries
+            ):
+                break
+            retries += 1
+            response.close()
+        if conditional:
+            response = self.conditional_cache.process(request, response)
+        return response
+
+    def _send_once(self, request: requests.PreparedRequest, **kwargs):
+        if self.scheduler is not None:
+            self.scheduler.acquire()
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except BaseException:
+            if self.scheduler is not None:
+                self.scheduler.release(0)
+            raise
+        if self.scheduler is not None:
+            self.scheduler.release(response.status_code, response.headers)
+        if self.metrics is not None:
+            body = request.body
+            self.metrics.record_request(
+                request.method,
+                response.status_code,
+                time.perf_counter() - start,
+                len(body) if isinstance(body, (bytes, str)) else 0,
+                0,
+                response.headers,
+            )
+            self._count_body(response, _current_operation.get() or "other")
+        return response
+
+    def _count_body(self, response: requests.Response, operation: str):
+        """
+        Reports the body bytes of response to metrics as they are read.
+
+        Both response.content and streamed reads go through iter_content,
+        so only the bytes actually read are counted. They are counted on
+        the wire with the urllib3 response's tell(), like Content-Length,
+        except for chunked bodies, which tell() does not count and which
+        are counted as decoded.
+        """
+        iter_content = response.iter_content
+        raw = response.raw
+        metrics = self.metrics
+
+        def counting_iter_content(*args, **kwargs):
+            wire = 0
+            for chunk in iter_content(*args, **kwargs):
+                tell = raw.tell() if hasattr(raw, "tell") else 0
+                if tell:
+                    read, wire = tell - wire, tell
+                else:
+                    read = len(chunk)
+                if read:
+                    metrics.record_response_bytes(operation, read)
+                yield chunk
+
+        response.iter_content = counting_iter_content
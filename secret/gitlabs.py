@@ -1,10 +1,41 @@
 """GitlabManager to manage interactions with GitLab."""
 
-from typing import List, Optional
+import base64
+import fnmatch
+import functools
+import glob
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from gitlab import Gitlab, GitlabError
+from gitlab import Gitlab, GitlabError, GitlabGetError
 from pydantic import BaseModel
 
+from gitlab_http import (
+    ConditionalCache,
+    GitlabAdapter,
+    GitlabMetrics,
+    RateLimitScheduler,
+)
+
 
 class FileInfo(BaseModel):
     """
@@ -19,43 +50,621 @@ class FileInfo(BaseModel):
     content: str
 
 
+class BulkCommitStats(BaseModel):
+    """
+    Throughput of a chunked bulk commit.
+
+    Attributes:
+        files (int): Files read from the input, skipped ones included.
+        committed_files (int): Files sent in commit actions.
+        commits (int): Commits created.
+        bytes (int): Content bytes sent.
+        seconds (float): Wall time.
+    """
+
+    files: int = 0
+    committed_files: int = 0
+    commits: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+
+_ESCAPED_MAGIC = re.compile(r"\[([*?[])\]")
+
+
+def _has_magic(part: str) -> bool:
+    """Whether a pattern component has wildcards not escaped by glob.escape."""
+    return any(char in _ESCAPED_MAGIC.sub("", part) for char in "*?[")
+
+
+def _unescape(part: str) -> str:
+    """The name a literal pattern component (see glob.escape) stands for."""
+    return _ESCAPED_MAGIC.sub(r"\1", part)
+
+
+def _write_json_atomic(path: str, data: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def git_blob_sha(content: Union[str, bytes]) -> str:
+    """
+    Computes the git blob SHA-1 of a content, as GitLab reports it in trees.
+
+    Args:
+        content (Union[str, bytes]): The file content. str is UTF-8 encoded.
+
+    Returns:
+        str: The hex blob id.
+    """
+    data = content.encode() if isinstance(content, str) else content
+    return hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+
+
+def _read_local_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _walk_local_files(local_dir: str) -> Iterator[Tuple[str, str]]:
+    """Yields (relative posix path, full path) of every file in local_dir."""
+    for root, dirs, names in os.walk(local_dir):
+        dirs[:] = sorted(d for d in dirs if d != ".git")
+        relative_root = os.path.relpath(root, local_dir).replace(os.sep, "/")
+        base = "" if relative_root == "." else relative_root + "/"
+        for name in sorted(names):
+            full_path = os.path.join(root, name)
+            if os.path.isfile(full_path):
+                yield base + name, full_path
+
+
+def _content_action(action: str, file_path: str, data: bytes) -> dict:
+    """A create/update commit action, base64 encoded if data is binary."""
+    try:
+        return {
+            "action": action,
+            "file_path": file_path,
+            "content": data.decode(),
+        }
+    except UnicodeDecodeError:
+        return {
+            "action": action,
+            "file_path": file_path,
+            "content": base64.b64encode(data).decode(),
+            "encoding": "base64",
+        }
+
+
+class LazyFile:
+    """
+    A file to commit whose content is only read when the commit payload is
+    built.
+
+    Args:
+        file_path (str): The path of the file in the repository.
+        source: A local file path, or a bytes-like object such as an mmap.
+    """
+
+    __slots__ = ("file_path", "source")
+
+    def __init__(
+        self,
+        file_path: str,
+        source: Union[str, os.PathLike, bytes, mmap.mmap],
+    ):
+        self.file_path = file_path
+        self.source = source
+
+    def read_bytes(self) -> bytes:
+        if isinstance(self.source, (str, os.PathLike)):
+            return _read_local_file(self.source)
+        return bytes(self.source)
+
+
+class FileBatch:
+    """
+    Compact collection of files to commit, for commits of many files.
+
+    Paths and sources are kept in two plain lists and a LazyFile is only
+    created while iterating, so a batch costs a few dozen bytes per file
+    and no content is held until commit_files_in_chunks builds a chunk.
+    """
+
+    __slots__ = ("_paths", "_sources")
+
+    def __init__(self):
+        self._paths: List[str] = []
+        self._sources: list = []
+
+    @classmethod
+    def from_directory(
+        cls, local_dir: str, remote_prefix: str = ""
+    ) -> "FileBatch":
+        """
+        Creates a batch of every file in local_dir, placed under
+        remote_prefix in the repository.
+        """
+        batch = cls()
+        prefix = remote_prefix.strip("/")
+        base = prefix + "/" if prefix else ""
+        for relative, full_path in _walk_local_files(local_dir):
+            batch.add(base + relative, full_path)
+        return batch
+
+    def add(
+        self,
+        file_path: str,
+        source: Union[str, os.PathLike, bytes, mmap.mmap],
+    ):
+        """
+        Adds a file.
+
+        Args:
+            file_path (str): The path of the file in the repository.
+            source: A local file path, or a bytes-like object such as an
+                mmap.
+        """
+        self._paths.append(file_path)
+        self._sources.append(source)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __iter__(self) -> Iterator[LazyFile]:
+        for file_path, source in zip(self._paths, self._sources):
+            yield LazyFile(file_path, source)
+
+
+def _file_bytes(file_info: Union[FileInfo, LazyFile]) -> bytes:
+    if isinstance(file_info, LazyFile):
+        return file_info.read_bytes()
+    return file_info.content.encode()
+
+
+class BlobCache:
+    """
+    Content-addressed cache of file contents keyed by git blob SHA.
+
+    Recently used blobs are kept in memory up to max_memory_bytes, and every
+    blob is also written to directory (if given) so later runs can reuse it.
+    Disk entries are checked against their SHA before being served.
+
+    Args:
+        directory (str, optional): Folder for the on-disk store.
+            Defaults to None (memory only).
+        max_memory_bytes (int, optional): Size bound of the in-memory LRU.
+            Defaults to 64 MiB.
+
+    Attributes:
+        hits (int): Lookups served from memory or disk.
+        misses (int): Lookups that needed a download.
+        bytes_saved (int): Content bytes served without a download.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _disk_path(self, blob_id: str) -> str:
+        return os.path.join(self.directory, blob_id[:2], blob_id[2:])
+
+    def _remember(self, blob_id: str, data: bytes):
+        if len(data) > self.max_memory_bytes:
+            return
+        if blob_id in self._memory:
+            self._memory.move_to_end(blob_id)
+            return
+        self._memory[blob_id] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _read_disk(self, blob_id: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._disk_path(blob_id), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if git_blob_sha(data) != blob_id:
+            os.remove(self._disk_path(blob_id))
+            return None
+        return data
+
+    def get(self, blob_id: str) -> Optional[bytes]:
+        """
+        Looks up a blob and updates the hit and miss counters.
+
+        Args:
+            blob_id (str): The git blob SHA.
+
+        Returns:
+            Optional[bytes]: The content, or None on a miss.
+        """
+        with self._lock:
+            data = self._memory.get(blob_id)
+            if data is not None:
+                self._memory.move_to_end(blob_id)
+        if data is None:
+            data = self._read_disk(blob_id)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self._remember(blob_id, data)
+            self.hits += 1
+            self.bytes_saved += len(data)
+        return data
+
+    def put(self, blob_id: str, data: bytes):
+        """
+        Stores a blob in memory and on disk.
+
+        Args:
+            blob_id (str): The git blob SHA of data.
+            data (bytes): The content.
+        """
+        with self._lock:
+            self._remember(blob_id, data)
+        if not self.directory or os.path.exists(self._disk_path(blob_id)):
+            return
+        folder = os.path.dirname(self._disk_path(blob_id))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._disk_path(blob_id))
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit, miss and bytes saved counters."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+            "memory_bytes": self._memory_bytes,
+        }
+
+
+class RepositoryTreeIndex:
+    """
+    Prefix index (trie) of the files of a branch at one commit.
+
+    Folders are nested dicts keyed by path component and files are leaves
+    holding their blob id, so lookups cost one step per path component.
+
+    Args:
+        commit_id (str): The commit SHA the tree was listed at.
+        tree (Iterable[dict]): Recursive repository_tree entries.
+
+    Attributes:
+        commit_id (str): The commit SHA the index is pinned to.
+        checked_at (float): time.monotonic() of the last head check.
+    """
+
+    def __init__(self, commit_id: str, tree: Iterable[dict]):
+        self.commit_id = commit_id
+        self.checked_at = time.monotonic()
+        self._root: dict = {}
+        for item in tree:
+            if item["type"] != "blob":
+                continue
+            *folders, name = item["path"].split("/")
+            node = self._root
+            for folder in folders:
+                node = node.setdefault(folder, {})
+            node[name] = item["id"]
+
+    def _node(self, path: str) -> Union[dict, str, None]:
+        node = self._root
+        for part in path.strip("/").split("/"):
+            if not part:
+                continue
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def exists(self, path: str) -> bool:
+        return self._node(path) is not None
+
+    def blob_id(self, path: str) -> Optional[str]:
+        node = self._node(path)
+        return node if isinstance(node, str) else None
+
+    def files_under(self, folder_path: str = "") -> List[str]:
+        """Returns the paths of all files below folder_path."""
+        node = self._node(folder_path)
+        if not isinstance(node, dict):
+            return []
+        prefix = folder_path.strip("/")
+        return list(self._walk(node, prefix + "/" if prefix else ""))
+
+    def blob_ids(self) -> Dict[str, str]:
+        """Returns path -> blob id for every file."""
+        return {
+            path: self.blob_id(path) for path in self._walk(self._root, "")
+        }
+
+    def match(self, pattern: str) -> List[str]:
+        """
+        Returns the files matched by a path, folder or glob pattern.
+
+        Components are matched one by one with fnmatch, "**" matches any
+        number of folders, and a matched folder stands for every file
+        below it. Names containing "*?[" must be escaped with glob.escape
+        to be matched literally.
+        """
+        parts = [part for part in pattern.strip("/").split("/") if part]
+        found: List[str] = []
+        self._match(self._root, "", parts, found)
+        return list(dict.fromkeys(found))
+
+    def _match(
+        self,
+        node: Union[dict, str],
+        prefix: str,
+        parts: List[str],
+        found: List[str],
+    ):
+        if not parts:
+            if isinstance(node, dict):
+                found.extend(self._walk(node, prefix))
+            else:
+                found.append(prefix.rstrip("/"))
+            return
+        if not isinstance(node, dict):
+            return
+
+        head, rest = parts[0], parts[1:]
+        if head == "**":
+            self._match(node, prefix, rest, found)
+            for name, child in node.items():
+                if isinstance(child, dict):
+                    self._match(child, f"{prefix}{name}/", parts, found)
+            return
+        if _has_magic(head):
+            names = [
+                name for name in node if fnmatch.fnmatchcase(name, head)
+            ]
+        else:
+            names = [name for name in [_unescape(head)] if name in node]
+        for name in names:
+            self._match(node[name], f"{prefix}{name}/", rest, found)
+
+    def _walk(self, node: dict, prefix: str) -> Iterable[str]:
+        for name, child in node.items():
+            if isinstance(child, dict):
+                yield from self._walk(child, f"{prefix}{name}/")
+            else:
+                yield prefix + name
+
+
+def _operation(method):
+    """Reports a public GitlabManager method to self.metrics, if set."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return method(self, *args, **kwargs)
+        with self.metrics.operation(method.__name__):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class GitlabManager:
     """
     Args:
         token (str): The GitLab access token.
         base_url (str): The base URL of the GitLab instance.
         project_id (int): The ID of the GitLab project.
+        blob_cache (BlobCache, optional): Serve get_file from this cache
+            when the blob id of path@branch is already known to it.
+            Defaults to None.
+        use_tree_index (bool, optional): Answer existence checks, folder
+            listings and blob id lookups from a RepositoryTreeIndex per
+            branch, rebuilt only when the branch head moves.
+            Defaults to False.
+        tree_index_ttl (float, optional): Seconds an index is trusted before
+            the branch head is checked again. Defaults to 0 (every lookup).
+        branch_cache_ttl (float, optional): Seconds the known branch names
+            are trusted. Defaults to 300.
+        branch_snapshot_path (str, optional): JSON file the branch names are
+            saved to and reloaded from at startup. Defaults to None.
+        metrics (GitlabMetrics, optional): Records the HTTP requests of
+            every public method. Defaults to None.
+        scheduler (RateLimitScheduler, optional): Paces every request to
+            stay below the rate limit and retries 429 responses. Share one
+            instance between managers to share the budget. Defaults to None.
+        conditional_cache (ConditionalCache, optional): Sends repeated GETs
+            with If-None-Match and serves 304 answers from the cache.
+            Defaults to None.
+        gl (Gitlab, optional): An existing client to share its HTTP session.
+            Its session is used as is, so scheduler and conditional_cache
+            are ignored and must be mounted by the caller.
+            Defaults to None (a new client from token and base_url).
+
+    The project is resolved lazily and no request is made at construction.
+    Branch names are listed only when branch_names is read; _validate_branch
+    otherwise looks up unknown names one at a time.
 
     Attributes:
         gl: An instance of Gitlab.
-        project: An instance of the GitLab project.
+        project: A lazy instance of the GitLab project.
         branch_names (set): A set containing the names of all branches.
+        blob_cache: The BlobCache used by get_file, or None.
+        metrics: The GitlabMetrics requests are reported to, or None.
+        last_bulk_commit_stats (BulkCommitStats): Throughput of the last
+            commit_files_in_chunks run.
 
     Methods:
         judge_file_or_folder_exist: Checks if a file/folder exists in the repo.
         get_all_files_path_in_folder: Retrieves all file paths in a folder.
         commit_files_to_gitlab: Commits changes to GitLab.
+        commit_files_in_chunks: Commits many files in bounded commits.
         delete_file_on_gitlab: Deletes a file from GitLab.
         delete_folder_on_gitlab: Deletes a folder and its contents from GitLab.
+        plan_deletes: Resolves files, folders and globs to file paths.
+        delete_paths_on_gitlab: Deletes many paths in one commit.
     """
 
-    def __init__(self, token: str, base_url: str, project_id: int):
-        self.gl = Gitlab(base_url, private_token=token)
-        self.project = self.gl.projects.get(project_id)
-        self.branch_names = {
-            branch.name for branch in self.project.branches.list()
+    def __init__(
+        self,
+        token: str,
+        base_url: str,
+        project_id: int,
+        blob_cache: Optional[BlobCache] = None,
+        use_tree_index: bool = False,
+        tree_index_ttl: float = 0.0,
+        branch_cache_ttl: float = 300.0,
+        branch_snapshot_path: Optional[str] = None,
+        metrics: Optional[GitlabMetrics] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
+        conditional_cache: Optional[ConditionalCache] = None,
+        gl: Optional[Gitlab] = None,
+    ):
+        self.metrics = metrics
+        if gl is not None:
+            self.gl = gl
+        else:
+            self.gl = Gitlab(base_url, private_token=token)
+            if any(
+                hook is not None
+                for hook in (metrics, scheduler, conditional_cache)
+            ):
+                GitlabAdapter(
+                    metrics=metrics,
+                    scheduler=scheduler,
+                    conditional_cache=conditional_cache,
+                ).mount(self.gl.session)
+        self.blob_cache = blob_cache
+        self.use_tree_index = use_tree_index
+        self.tree_index_ttl = tree_index_ttl
+        self._tree_indexes: Dict[str, RepositoryTreeIndex] = {}
+        self.last_bulk_commit_stats = BulkCommitStats()
+        self.project = self.gl.projects.get(project_id, lazy=True)
+        self.branch_cache_ttl = branch_cache_ttl
+        self.branch_snapshot_path = branch_snapshot_path
+        self._branch_cache = {
+            "fetched_at": time.time(),
+            "complete": False,
+            "names": set(),
         }
+        self._load_branch_snapshot()
+
+    def _load_branch_snapshot(self):
+        if not self.branch_snapshot_path:
+            return
+        try:
+            with open(self.branch_snapshot_path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        if snapshot.get("project_id") != str(self.project.id):
+            return
+        self._branch_cache = {
+            "fetched_at": snapshot["fetched_at"],
+            "complete": snapshot["complete"],
+            "names": set(snapshot["names"]),
+        }
+
+    def _save_branch_snapshot(self):
+        if not self.branch_snapshot_path:
+            return
+        _write_json_atomic(self.branch_snapshot_path, {
+            "project_id": str(self.project.id),
+            "fetched_at": self._branch_cache["fetched_at"],
+            "complete": self._branch_cache["complete"],
+            "names": sorted(self._branch_cache["names"]),
+        })
+
+    def _known_branches(self) -> set:
+        cache = self._branch_cache
+        if time.time() - cache["fetched_at"] > self.branch_cache_ttl:
+            cache.update(fetched_at=time.time(), complete=False, names=set())
+        return cache["names"]
+
+    @property
+    def branch_names(self) -> set:
+        self._known_branches()
+        if not self._branch_cache["complete"]:
+            self._branch_cache = {
+                "fetched_at": time.time(),
+                "complete": True,
+                "names": {
+                    branch.name
+                    for branch in self.project.branches.list(get_all=True)
+                },
+            }
+            self._save_branch_snapshot()
+        return self._branch_cache["names"]
 
     def _validate_path(self, path: str):
         if not path:
             raise ValueError("Path cannot be empty")
 
     def _validate_branch(self, branch: str):
-        if branch not in self.branch_names:
+        known = self._known_branches()
+        if branch in known:
+            return
+        try:
+            self.project.branches.get(branch)
+        except GitlabGetError as e:
+            # The lazy project is first looked up here, and a missing
+            # project is a 404 as well: "404 Project Not Found" instead of
+            # "404 Branch Not Found". Raise it as the eager lookup did.
+            if e.response_code != 404 or "Project" in str(e.error_message):
+                raise
             raise ValueError(
                 f"Branch '{branch}' does not exist in the project"
+            ) from e
+        known.add(branch)
+        self._save_branch_snapshot()
+
+    def _get_tree_index(self, branch: str) -> RepositoryTreeIndex:
+        index = self._tree_indexes.get(branch)
+        now = time.monotonic()
+        if index is not None and now - index.checked_at < self.tree_index_ttl:
+            return index
+
+        head = self.project.branches.get(branch).commit["id"]
+        if index is None or index.commit_id != head:
+            tree = self.project.repository_tree(
+                ref=head, recursive=True, get_all=True, per_page=100
             )
+            index = RepositoryTreeIndex(head, tree)
+            self._tree_indexes[branch] = index
+        index.checked_at = now
+        return index
 
+    def _invalidate_tree_index(self, branch: str):
+        self._tree_indexes.pop(branch, None)
+
+    @_operation
     def get_file(self, path: str, branch: str = "main") -> Optional[str]:
         """
         Retrieves the content of a file.
@@ -68,21 +677,175 @@ class GitlabManager:
             Optional[str]: The content of the file,
             or None if the file is not found.
         """
+        data = self.get_file_bytes(path, branch)
+        return data.decode() if data is not None else None
+
+    @_operation
+    def get_file_bytes(
+        self, path: str, branch: str = "main"
+    ) -> Optional[bytes]:
+        """
+        Retrieves the content of a file as bytes from the raw endpoint,
+        without base64 or text decoding.
+
+        Args:
+            path (str): The path of the file.
+            branch (str, optional): The branch name. Defaults to main.
+
+        Returns:
+            Optional[bytes]: The content of the file,
+            or None if the file is not found.
+        """
         try:
-            return (
-                self.project.files.get(file_path=path, ref=branch)
-                .decode()
-                .decode()
-            )
+            if self.blob_cache is not None:
+                return self._get_file_cached(path, branch)
+            return self.project.files.raw(file_path=path, ref=branch)
         except GitlabError as e:
             print(f"Error retrieving file {path}: {e}")
             return None
 
+    @_operation
+    def iter_file_chunks(
+        self, path: str, branch: str = "main", chunk_size: int = 1024 * 1024
+    ) -> Iterator[bytes]:
+        """
+        Streams the content of a file from the raw endpoint.
+
+        Args:
+            path (str): The path of the file.
+            branch (str, optional): The branch name. Defaults to main.
+            chunk_size (int, optional): Bytes per chunk. Defaults to 1 MiB.
+
+        Returns:
+            Iterator[bytes]: The content in chunks of at most chunk_size.
+
+        Raises:
+            GitlabGetError: If the file could not be retrieved.
+        """
+        return self.project.files.raw(
+            file_path=path,
+            ref=branch,
+            streamed=True,
+            iterator=True,
+            chunk_size=chunk_size,
+        )
+
+    @_operation
+    def download_file(
+        self,
+        path: str,
+        fileobj: BinaryIO,
+        branch: str = "main",
+        chunk_size: int = 1024 * 1024,
+    ) -> bool:
+        """
+        Writes the content of a file to a binary file object chunk by chunk,
+        so memory use does not grow with the file size.
+
+        Args:
+            path (str): The path of the file.
+            fileobj (BinaryIO): Destination opened for binary writing.
+            branch (str, optional): The branch name. Defaults to main.
+            chunk_size (int, optional): Bytes per chunk. Defaults to 1 MiB.
+
+        Returns:
+            bool: True if the download is successful, False otherwise.
+        """
+        try:
+            self.project.files.raw(
+                file_path=path,
+                ref=branch,
+                streamed=True,
+                action=fileobj.write,
+                chunk_size=chunk_size,
+            )
+            return True
+        except GitlabError as e:
+            print(f"Error downloading file {path}: {e}")
+            return False
+
+    def _get_file_cached(self, path: str, branch: str) -> Optional[bytes]:
+        if self.use_tree_index:
+            blob_id = self._get_tree_index(branch).blob_id(path)
+            if blob_id is None:
+                return None
+        else:
+            headers = self.project.files.head(path, ref=branch)
+            blob_id = headers["X-Gitlab-Blob-Id"]
+        data = self.blob_cache.get(blob_id)
+        if data is None:
+            data = self._download_into_cache(path, branch)
+        return data
+
+    def _download_into_cache(self, path: str, branch: str) -> bytes:
+        data = self.project.files.raw(file_path=path, ref=branch)
+        self.blob_cache.put(git_blob_sha(data), data)
+        return data
+
+    @_operation
+    def get_files(
+        self, paths: List[str], branch: str = "main"
+    ) -> Dict[str, Optional[str]]:
+        """
+        Retrieves the contents of many files.
+
+        With a blob cache, one tree listing resolves every path to its blob
+        id and only blobs missing from the cache are downloaded.
+
+        Args:
+            paths (List[str]): The paths of the files.
+            branch (str, optional): The branch name. Defaults to main.
+
+        Returns:
+            Dict[str, Optional[str]]: path -> content, None if not found.
+        """
+        if self.blob_cache is None:
+            return {path: self.get_file(path, branch) for path in paths}
+
+        try:
+            blob_ids = self._get_tree_blob_ids(branch)
+        except GitlabError as e:
+            print(f"Error retrieving files: {e}")
+            return {path: None for path in paths}
+
+        contents = {}
+        for path in paths:
+            blob_id = blob_ids.get(path)
+            data = self.blob_cache.get(blob_id) if blob_id else None
+            if data is None and blob_id is not None:
+                try:
+                    data = self._download_into_cache(path, branch)
+                except GitlabError as e:
+                    print(f"Error retrieving file {path}: {e}")
+            contents[path] = data.decode() if data is not None else None
+        return contents
+
     def _check_content_match(
         self, existing_content: str, new_content: str
     ) -> bool:
         return existing_content is not None and existing_content == new_content
 
+    def _get_tree_blob_ids(
+        self, branch: str, path: str = ""
+    ) -> Dict[str, str]:
+        if self.use_tree_index:
+            blob_ids = self._get_tree_index(branch).blob_ids()
+            if not path:
+                return blob_ids
+            base = path.strip("/") + "/"
+            return {
+                file_path: blob_id
+                for file_path, blob_id in blob_ids.items()
+                if file_path.startswith(base)
+            }
+        tree = self.project.repository_tree(
+            path=path, ref=branch, recursive=True, get_all=True, per_page=100
+        )
+        return {
+            item["path"]: item["id"] for item in tree if item["type"] == "blob"
+        }
+
+    @_operation
     def judge_file_or_folder_exist(
         self, path: str, branch: str = "main"
     ) -> bool:
@@ -99,6 +862,12 @@ class GitlabManager:
         self._validate_path(path)
         self._validate_branch(branch)
 
+        if self.use_tree_index:
+            try:
+                return self._get_tree_index(branch).exists(path)
+            except GitlabError:
+                return False
+
         try:
             self.project.files.get(file_path=path, ref=branch)
             return True
@@ -106,11 +875,14 @@ class GitlabManager:
             pass
 
         try:
-            self.project.repository_tree(path=path, ref_name=branch)
+            self.project.repository_tree(
+                path=path, ref=branch, per_page=1, get_all=False
+            )
             return True
         except GitlabError:
             return False
 
+    @_operation
     def get_all_files_path_in_folder(
         self, folder_path: str = "", branch: str = "main"
     ) -> List[str]:
@@ -126,40 +898,35 @@ class GitlabManager:
             List[str]: A list of file paths.
         """
         self._validate_branch(branch)
-        all_files = set()
 
         try:
+            if self.use_tree_index:
+                return self._get_tree_index(branch).files_under(folder_path)
+
             # If folder_path is empty, start from the root folder
             if not folder_path:
                 folder_path = "/"
 
-            # Retrieve all files under the specified folder
+            # The recursive listing already includes files of all subfolders
             files = self.project.repository_tree(
-                path=folder_path, ref_name=branch, recursive=True, get_all=True
+                path=folder_path,
+                ref=branch,
+                recursive=True,
+                get_all=True,
+                per_page=100,
             )
-
-            for file in files:
-                if file["type"] == "blob":
-                    all_files.add(file["path"])
-
-            # Recursively collect file paths from subfolders
-            subfolders = [
-                file["path"] for file in files if file.get("type") == "tree"
-            ]
-
-            for subfolder in subfolders:
-                subfolder_files = self.get_all_files_path_in_folder(
-                    subfolder, branch
-                )
-                all_files.update(subfolder_files)
-
-            return list(all_files)
+            return [file["path"] for file in files if file["type"] == "blob"]
         except GitlabError as e:
             print(f"Error retrieving files in folder: {e}")
             return []
 
+    @_operation
     def commit_files_to_gitlab(
-        self, files: List[FileInfo], commit_message: str, branch: str = "main"
+        self,
+        files: List[FileInfo],
+        commit_message: str,
+        branch: str = "main",
+        compare_by_sha: bool = False,
     ) -> bool:
         """
         Commits changes to GitLab.
@@ -168,6 +935,9 @@ class GitlabManager:
             files (List[FileInfo]): A list of FileInfo obj contain file info
             commit_message (str): The commit message.
             branch (str, optional): The branch name. Defaults to "main".
+            compare_by_sha (bool, optional): Fetch the branch tree once and
+                compare git blob SHAs computed locally, instead of downloading
+                every file. Defaults to False.
 
         Returns:
             bool: True if the commit is successful, False otherwise.
@@ -176,19 +946,30 @@ class GitlabManager:
         actions = []
 
         try:
+            remote_blob_ids = (
+                self._get_tree_blob_ids(branch) if compare_by_sha else {}
+            )
             for file_info in files:
                 file_path = file_info.file_path
                 content = file_info.content
-                existing_content = self.get_file(file_path, branch)
 
-                if self._check_content_match(existing_content, content):
+                if compare_by_sha:
+                    remote_blob_id = remote_blob_ids.get(file_path)
+                    exists = remote_blob_id is not None
+                    unchanged = remote_blob_id == git_blob_sha(content)
+                else:
+                    existing_content = self.get_file(file_path, branch)
+                    exists = existing_content is not None
+                    unchanged = self._check_content_match(
+                        existing_content, content
+                    )
+
+                if unchanged:
                     print(f"Skipping commit for file {file_path}")
                     continue
 
                 actions.append({
-                    "action": (
-                        "update" if existing_content is not None else "create"
-                    ),
+                    "action": "update" if exists else "create",
                     "file_path": file_path,
                     "content": content,
                 })
@@ -201,12 +982,174 @@ class GitlabManager:
                     "branch": branch,
                     "commit_message": commit_message,
                 })
+                self._invalidate_tree_index(branch)
+            return True
+
+        except GitlabError as e:
+            print(f"Error committing files to GitLab: {e}")
+            return False
+
+    def _iter_action_chunks(
+        self,
+        files: Iterable[Union[FileInfo, LazyFile]],
+        remote_blob_ids: Dict[str, str],
+        max_actions: int,
+        max_bytes: int,
+    ) -> Iterator[Tuple[List[dict], int, int]]:
+        """
+        Yields (actions, files consumed, content bytes sent) per chunk.
+        Binary content counts with its base64 encoding, which is what the
+        commit payload carries.
+        """
+        actions: List[dict] = []
+        consumed = 0
+        size = 0
+        for file_info in files:
+            data = _file_bytes(file_info)
+            remote_blob_id = remote_blob_ids.get(file_info.file_path)
+            action = None
+            action_size = 0
+            if remote_blob_id != git_blob_sha(data):
+                action = _content_action(
+                    "update" if remote_blob_id else "create",
+                    file_info.file_path,
+                    data,
+                )
+                action_size = (
+                    len(action["content"]) if "encoding" in action
+                    else len(data)
+                )
+            if actions and action is not None and (
+                len(actions) >= max_actions
+                or size + action_size > max_bytes
+            ):
+                yield actions, consumed, size
+                actions, consumed, size = [], 0, 0
+
+            consumed += 1
+            if action is not None:
+                actions.append(action)
+                size += action_size
+        if consumed:
+            yield actions, consumed, size
+
+    @staticmethod
+    def _load_progress(
+        progress_path: Optional[str], branch: str, commit_message: str
+    ) -> dict:
+        progress = {
+            "branch": branch,
+            "commit_message": commit_message,
+            "files_done": 0,
+            "commits": [],
+        }
+        if not progress_path:
+            return progress
+        try:
+            with open(progress_path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):  # missing, truncated or corrupt
+            return progress
+        if (
+            isinstance(saved, dict)
+            and (saved.get("branch"), saved.get("commit_message"))
+            == (branch, commit_message)
+            and isinstance(saved.get("files_done"), int)
+            and isinstance(saved.get("commits"), list)
+        ):
+            progress = saved
+        return progress
+
+    @staticmethod
+    def _save_progress(progress_path: Optional[str], progress: dict):
+        if progress_path:
+            _write_json_atomic(progress_path, progress)
+
+    @_operation
+    def commit_files_in_chunks(
+        self,
+        files: Iterable[Union[FileInfo, LazyFile]],
+        commit_message: str,
+        branch: str = "main",
+        max_actions: int = 1000,
+        max_bytes: int = 8 * 1024 * 1024,
+        progress_path: Optional[str] = None,
+    ) -> bool:
+        """
+        Commits many files as a series of commits bounded by action count
+        and content size.
+
+        files is consumed lazily, so only one chunk of content is held at a
+        time. With a FileBatch or other LazyFile objects, content is also
+        only read from disk or mmap while its chunk is built, and binary
+        content is sent base64 encoded. Unchanged files are skipped by
+        comparing git blob SHAs with one tree listing. With progress_path,
+        the number of files already committed is saved after every chunk,
+        and a later call with the same branch and commit message continues
+        after them. The progress file is removed once every chunk is
+        committed.
+
+        Args:
+            files (Iterable[Union[FileInfo, LazyFile]]): FileInfo obj or
+                LazyFile, e.g. a FileBatch, in a stable order.
+            commit_message (str): The commit message, each chunk gets a
+                "[part N]" suffix.
+            branch (str, optional): The branch name. Defaults to "main".
+            max_actions (int, optional): Actions per commit. Defaults to 1000.
+            max_bytes (int, optional): Content bytes per commit, binary
+                content counted base64 encoded. Defaults to 8 MiB.
+            progress_path (str, optional): JSON file to record progress in.
+                A file that cannot be read or parsed starts a fresh run.
+                Defaults to None.
+
+        Returns:
+            bool: True if every chunk is committed, False otherwise.
+        """
+        self._validate_branch(branch)
+        progress = self._load_progress(progress_path, branch, commit_message)
+        stats = BulkCommitStats()
+        self.last_bulk_commit_stats = stats
+        start = time.perf_counter()
+
+        try:
+            remote_blob_ids = self._get_tree_blob_ids(branch)
+            remaining = itertools.islice(files, progress["files_done"], None)
+            for actions, consumed, size in self._iter_action_chunks(
+                remaining, remote_blob_ids, max_actions, max_bytes
+            ):
+                if actions:
+                    part = len(progress["commits"]) + 1
+                    commit = self.project.commits.create({
+                        "actions": actions,
+                        "branch": branch,
+                        "commit_message": f"{commit_message} [part {part}]",
+                    })
+                    self._invalidate_tree_index(branch)
+                    progress["commits"].append(commit.id)
+                    stats.commits += 1
+                    stats.committed_files += len(actions)
+                    stats.bytes += size
+                stats.files += consumed
+                progress["files_done"] += consumed
+                self._save_progress(progress_path, progress)
+
+            if progress_path and os.path.exists(progress_path):
+                os.remove(progress_path)
             return True
 
         except GitlabError as e:
             print(f"Error committing files to GitLab: {e}")
             return False
 
+        finally:
+            stats.seconds = time.perf_counter() - start
+            print(
+                f"Committed {stats.committed_files}/{stats.files} files in "
+                f"{stats.commits} commits, {stats.files_per_second:.1f} "
+                f"files/s, {stats.mb_per_second:.2f} MB/s"
+            )
+
+    @_operation
     def delete_file_on_gitlab(
         self, file_path: str, commit_message: str, branch: str = "main"
     ) -> bool:
@@ -231,11 +1174,13 @@ class GitlabManager:
             self.project.files.delete(
                 file_path, branch=branch, commit_message=commit_message
             )
+            self._invalidate_tree_index(branch)
             return True
         except GitlabError as e:
             print(f"Error deleting file on GitLab: {e}")
             return False
 
+    @_operation
     def delete_folder_on_gitlab(
         self, folder_path: str, commit_message: str, branch: str = "main"
     ) -> bool:
@@ -251,35 +1196,300 @@ class GitlabManager:
             bool: True if the deletion is successful, False otherwise.
         """
         self._validate_path(folder_path)
+        return self.delete_paths_on_gitlab(
+            [glob.escape(folder_path.rstrip("/")) + "/"],
+            commit_message,
+            branch,
+        )
+
+    @staticmethod
+    def _listing_prefix(patterns: List[str]) -> str:
+        """Deepest folder that contains every path the patterns can match."""
+        prefixes = []
+        for pattern in patterns:
+            parts = [part for part in pattern.strip("/").split("/") if part]
+            literal = list(
+                itertools.takewhile(lambda p: not _has_magic(p), parts)
+            )
+            # A literal pattern may name a file, so list its parent
+            if literal == parts and not pattern.endswith("/"):
+                literal = literal[:-1]
+            prefixes.append([_unescape(part) for part in literal])
+        common = []
+        for level in zip(*prefixes):
+            if len(set(level)) != 1:
+                break
+            common.append(level[0])
+        return "/".join(common)
+
+    @_operation
+    def plan_deletes(
+        self, patterns: Iterable[str], branch: str = "main"
+    ) -> List[str]:
+        """
+        Resolves files, folders and glob patterns to the files to delete.
+
+        All patterns are resolved against a single tree listing: the branch
+        tree index when use_tree_index is set, otherwise one recursive
+        listing of the deepest folder shared by the patterns.
+
+        Args:
+            patterns (Iterable[str]): File paths, folder paths or globs,
+                e.g. "src_*" or "switch_status/*/golden_config". A trailing
+                "/" marks a folder and lets the listing start inside it.
+                Escape names containing "*?[" with glob.escape.
+            branch (str, optional): The branch name. Defaults to "main".
+
+        Returns:
+            List[str]: The file paths, each listed once.
+
+        Raises:
+            GitlabError: If the tree could not be listed.
+        """
         self._validate_branch(branch)
-        if not self.judge_file_or_folder_exist(folder_path, branch):
-            print(f"Folder '{folder_path}' does not exist.")
-            return True
+        patterns = [pattern for pattern in patterns if pattern.strip("/")]
+        if not patterns:
+            return []
+
+        if self.use_tree_index:
+            index = self._get_tree_index(branch)
+        else:
+            prefix = self._listing_prefix(patterns)
+            try:
+                tree = self.project.repository_tree(
+                    path=prefix,
+                    ref=branch,
+                    recursive=True,
+                    get_all=True,
+                    per_page=100,
+                )
+            except GitlabGetError as e:
+                if e.response_code != 404:
+                    raise
+                tree = []
+            index = RepositoryTreeIndex("", tree)
+
+        planned = []
+        for pattern in patterns:
+            planned.extend(index.match(pattern))
+        return list(dict.fromkeys(planned))
 
+    @_operation
+    def delete_paths_on_gitlab(
+        self,
+        patterns: Iterable[str],
+        commit_message: str,
+        branch: str = "main",
+        max_actions: int = 1000,
+    ) -> bool:
+        """
+        Deletes many files, folders and glob matches in one commit, or in
+        one commit per max_actions files.
+
+        Args:
+            patterns (Iterable[str]): File paths, folder paths or globs.
+            commit_message (str): The commit message for the deletion.
+            branch (str, optional): The branch name. Defaults to "main".
+            max_actions (int, optional): Files per commit. Defaults to 1000.
+
+        Returns:
+            bool: True if the deletion is successful, False otherwise.
+        """
+        patterns = list(patterns)
         try:
-            # Retrieve all files within the folder
-            files = self.get_all_files_path_in_folder(folder_path, branch)
-            print(f"Files ready to delete: {files}")
-
-            # Delete each file within the folder
-            actions = [
-                {"action": "delete", "file_path": file_path}
-                for file_path in files
+            files = self.plan_deletes(patterns, branch)
+            if not files:
+                print(f"Nothing to delete for {patterns}.")
+                return True
+            print(f"Files ready to delete: {len(files)}")
+
+            chunks = [
+                files[i:i + max_actions]
+                for i in range(0, len(files), max_actions)
             ]
-            print(f"{actions=}")
+            for part, chunk in enumerate(chunks, start=1):
+                message = commit_message
+                if len(chunks) > 1:
+                    message = f"{commit_message} [part {part}]"
+                self.project.commits.create({
+                    "actions": [
+                        {"action": "delete", "file_path": file_path}
+                        for file_path in chunk
+                    ],
+                    "branch": branch,
+                    "commit_message": message,
+                })
+                self._invalidate_tree_index(branch)
+            return True
+        except GitlabError as e:
+            print(f"Error deleting files on GitLab: {e}")
+            return False
+
+    @staticmethod
+    def _hash_local_directory(
+        local_dir: str, max_workers: int
+    ) -> Dict[str, str]:
+        """Relative posix path -> git blob SHA of every file in local_dir."""
+        local_paths = dict(_walk_local_files(local_dir))
+
+        def blob_sha(full_path: str) -> str:
+            return git_blob_sha(_read_local_file(full_path))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            shas = executor.map(blob_sha, local_paths.values())
+            return dict(zip(local_paths, shas))
+
+    @_operation
+    def plan_sync(
+        self,
+        local_dir: str,
+        remote_prefix: str = "",
+        branch: str = "main",
+        max_workers: int = 8,
+    ) -> List[dict]:
+        """
+        Computes the commit actions that make remote_prefix on the branch
+        match local_dir.
+
+        Local files are hashed in parallel and compared by git blob SHA with
+        one tree listing of remote_prefix. A file deleted remotely whose
+        content shows up under a new local path becomes a move, which sends
+        no content. Only changed files are read a second time.
+
+        Args:
+            local_dir (str): The local directory to mirror.
+            remote_prefix (str, optional): The remote folder to mirror it to.
+                Defaults to "" (repository root).
+            branch (str, optional): The branch name. Defaults to "main".
+            max_workers (int, optional): Threads hashing local files.
+                Defaults to 8.
+
+        Returns:
+            List[dict]: Commit actions in create, update, move, delete order.
+
+        Raises:
+            FileNotFoundError: If local_dir does not exist.
+            NotADirectoryError: If local_dir is not a directory.
+            GitlabError: If the tree could not be listed.
+        """
+        # A missing directory would look empty and plan deleting everything
+        if not os.path.exists(local_dir):
+            raise FileNotFoundError(f"Local directory '{local_dir}' not found")
+        if not os.path.isdir(local_dir):
+            raise NotADirectoryError(f"'{local_dir}' is not a directory")
+        self._validate_branch(branch)
+        prefix = remote_prefix.strip("/")
+        base = prefix + "/" if prefix else ""
+        local = {
+            base + relative: sha
+            for relative, sha in self._hash_local_directory(
+                local_dir, max_workers
+            ).items()
+        }
+        try:
+            remote = self._get_tree_blob_ids(branch, prefix)
+        except GitlabGetError as e:
+            if e.response_code != 404:
+                raise
+            remote = {}
+
+        created = [path for path in local if path not in remote]
+        updated = [
+            path
+            for path in local
+            if path in remote and remote[path] != local[path]
+        ]
+        deleted: Dict[str, List[str]] = {}
+        for path, sha in remote.items():
+            if path not in local:
+                deleted.setdefault(sha, []).append(path)
+
+        actions = []
+        moves = []
+        for path in created:
+            previous_paths = deleted.get(local[path])
+            if previous_paths:
+                moves.append({
+                    "action": "move",
+                    "file_path": path,
+                    "previous_path": previous_paths.pop(),
+                })
+                continue
+            actions.append(_content_action(
+                "create",
+                path,
+                _read_local_file(os.path.join(local_dir, path[len(base):])),
+            ))
+        for path in updated:
+            actions.append(_content_action(
+                "update",
+                path,
+                _read_local_file(os.path.join(local_dir, path[len(base):])),
+            ))
+        actions.extend(moves)
+        actions.extend(
+            {"action": "delete", "file_path": path}
+            for paths in deleted.values()
+            for path in paths
+        )
+        return actions
+
+    @_operation
+    def sync_directory(
+        self,
+        local_dir: str,
+        remote_prefix: str = "",
+        branch: str = "main",
+        commit_message: Optional[str] = None,
+        max_workers: int = 8,
+    ) -> bool:
+        """
+        Makes remote_prefix on the branch an exact copy of local_dir in a
+        single commit, including deletes of files removed locally.
+
+        When nothing changed no commit is made, and the only request is the
+        tree listing (or the branch head check with a fresh tree index).
+
+        Args:
+            local_dir (str): The local directory to mirror.
+            remote_prefix (str, optional): The remote folder to mirror it to.
+                Defaults to "" (repository root).
+            branch (str, optional): The branch name. Defaults to "main".
+            commit_message (str, optional): The commit message.
+                Defaults to "Sync <remote_prefix>".
+            max_workers (int, optional): Threads hashing local files.
+                Defaults to 8.
+
+        Returns:
+            bool: True if the sync is successful, False otherwise.
+        """
+        try:
+            actions = self.plan_sync(
+                local_dir, remote_prefix, branch, max_workers
+            )
+            if not actions:
+                print("No files need to commit.")
+                return True
+
+            counts = Counter(a["action"] for a in actions)
+            print(
+                "Syncing "
+                + ", ".join(f"{n} {kind}" for kind, n in counts.items())
+            )
             self.project.commits.create({
                 "actions": actions,
                 "branch": branch,
-                "commit_message": commit_message,
+                "commit_message": (
+                    commit_message or f"Sync {remote_prefix.strip('/') or '/'}"
+                ),
             })
-
+            self._invalidate_tree_index(branch)
             return True
-        except GitlabError as e:
-            print(f"Error deleting folder on GitLab: {e}")
+        except (GitlabError, OSError) as e:
+            print(f"Error syncing directory to GitLab: {e}")
             return False
-        
-
 
+    @_operation
     def new_get_all_files_path_in_folder(
         self, folder_path: str = "", branch: str = "main"
     ) -> List[str]:
@@ -0,0 +1,371 @@
+"""Benchmarks for NginxConfig on synthetic configs."""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+from pynginxconfig import NginxConfig
+
+SIZES_MB = (0.001, 0.1, 1, 20, 100)
+
+
+def server_block(index: int, n_locations: int = 20) -> str:
+    """One server block of about 1.5 KB with n_locations locations."""
+    lines = [
+        "    server {",
+        "        listen 80;",
+        f"        server_name s{index}.example.com www.s{index}.example.com;",
+        "        # upstream of this server",
+        "        log_format main '$remote_addr - $remote_user'",
+        "                        '\"$request\" $status';",
+    ]
+    for location in range(n_locations):
+        lines += [
+            f"        location /app{location}/ {{",
+            f"            proxy_pass http://127.0.0.1:{8000 + location}/;",
+            "            proxy_set_header Host $host;",
+            "        }",
+        ]
+    lines.append("    }")
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_config(size_bytes: int, n_locations: int = 20) -> str:
+    """An http block of server blocks of about size_bytes in total."""
+    blocks = ["worker_processes 4;\n", "http {\n"]
+    total = sum(map(len, blocks))
+    index = 0
+    while total < size_bytes:
+        block = server_block(index, n_locations)
+        blocks.append(block)
+        total += len(block)
+        index += 1
+    blocks.append("}\n")
+    return "".join(blocks)
+
+
+def parse_legacy(text: str) -> list:
+    nc = NginxConfig()
+    nc.config = text
+    nc.i = 0
+    nc.length = len(text)
+    return nc.parse_block()
+
+
+def parse_tokens(text: str) -> list:
+    return NginxConfig().parse_config(text)
+
+
+def _time(func: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_parse(
+    sizes_mb: List[float] = SIZES_MB, legacy_max_mb: float = 100
+) -> List[dict]:
+    """
+    Compares parse_block with parse_config on synthetic configs, and checks
+    that both build the same tree.
+
+    Args:
+        sizes_mb (List[float], optional): Config sizes in MB.
+        legacy_max_mb (float, optional): Largest size parse_block runs on.
+
+    Returns:
+        List[dict]: One result row per size.
+    """
+    rows = []
+    for size_mb in sizes_mb:
+        text = synthetic_config(int(size_mb * 1_000_000))
+        row = {"size_mb": len(text) / 1e6}
+        start = time.perf_counter()
+        tree = parse_tokens(text)
+        row["parse_config_s"] = time.perf_counter() - start
+        if size_mb <= legacy_max_mb:
+            start = time.perf_counter()
+            legacy_tree = parse_legacy(text)
+            row["parse_block_s"] = time.perf_counter() - start
+            row["speedup"] = row["parse_block_s"] / row["parse_config_s"]
+            row["same_tree"] = legacy_tree == tree
+        rows.append(row)
+    return rows
+
+
+def scan(data: list, path: list):
+    """Looks path up by scanning every sibling, as get() did before."""
+    for key in path:
+        if isinstance(data, dict):
+            data = data["value"]
+        for node in data:
+            if isinstance(key, str) and isinstance(node, tuple):
+                if node[0] == key:
+                    break
+            elif isinstance(key, tuple) and isinstance(node, dict):
+                if (node["name"], node["param"]) == key:
+                    break
+        else:
+            return None
+        data = node
+    return data
+
+
+def bench_lookups(
+    n_locations: int = 10_000, n_lookups: int = 10_000
+) -> dict:
+    """
+    Times n_lookups get() calls of proxy_pass in random locations of a server
+    with n_locations locations, against a linear scan of the same paths, and
+    then sets and removes every location through the index.
+
+    Args:
+        n_locations (int, optional): Number of location blocks.
+        n_lookups (int, optional): Number of lookups.
+
+    Returns:
+        dict: Result row.
+    """
+    nc = NginxConfig()
+    nc.load("http {\n" + server_block(0, n_locations) + "}\n")
+    rng = random.Random(0)
+    paths = [
+        [("http", ""), ("server", ""), ("location", f"/app{index}/"),
+         "proxy_pass"]
+        for index in (rng.randrange(n_locations) for _ in range(n_lookups))
+    ]
+    row = {"locations": n_locations, "lookups": n_lookups}
+
+    row["index_s"] = _time(lambda: [nc.get(list(path)) for path in paths])
+    row["scan_s"] = _time(lambda: [scan(nc.data, path) for path in paths])
+    row["speedup"] = row["scan_s"] / row["index_s"]
+    row["same_result"] = all(
+        nc.get(list(path)) is scan(nc.data, path) for path in paths
+    )
+
+    server = [("http", ""), ("server", "")]
+    row["set_s"] = _time(lambda: [
+        nc.set(server + [("location", f"/app{index}/"), "proxy_pass"],
+               f"http://127.0.0.1:{9000 + index}/")
+        for index in range(n_locations)
+    ])
+    row["remove_s"] = _time(lambda: [
+        nc.remove(server + [("location", f"/app{index}/")])
+        for index in range(n_locations)
+    ])
+    return row
+
+
+def render_concat(nc: NginxConfig, blocks: list, offset: int = 0) -> str:
+    """Renders blocks by string concatenation, as gen_block did before."""
+    text = ""
+    for block in blocks:
+        indent = nc.off_char * offset
+        if isinstance(block, tuple):
+            text += indent + "%s %s;\n" % block
+        elif isinstance(block, dict):
+            param = block["param"] + " " if block["param"] else ""
+            if text:
+                text += "\n"
+            text += "%s%s %s{\n%s%s}\n" % (
+                indent, block["name"], param,
+                render_concat(nc, block["value"], offset + 4), indent,
+            )
+    return text
+
+
+def _peak_mb(func: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def bench_write(sizes_mb: List[float] = SIZES_MB) -> List[dict]:
+    """
+    Times savef(), which streams the rendered config to the file, against
+    rendering the whole text by concatenation and writing it at once, and
+    compares the memory each allocates on top of the parsed tree.
+
+    Args:
+        sizes_mb (List[float], optional): Config sizes in MB.
+
+    Returns:
+        List[dict]: One result row per size.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "nginx.conf")
+        for size_mb in sizes_mb:
+            nc = NginxConfig()
+            nc.load(synthetic_config(int(size_mb * 1_000_000)))
+            row = {"size_mb": nc.length / 1e6}
+
+            def write_concat():
+                with open(path, "w") as f:
+                    f.write(render_concat(nc, nc.data))
+
+            row["savef_s"] = _time(lambda: nc.savef(path))
+            row["concat_s"] = _time(write_concat)
+            row["savef_peak_mb"] = _peak_mb(lambda: nc.savef(path))
+            row["concat_peak_mb"] = _peak_mb(write_concat)
+            rows.append(row)
+    return rows
+
+
+def bench_reload(sizes_mb: List[float] = SIZES_MB) -> List[dict]:
+    """
+    Times reload() after one-block edits in the middle of synthetic
+    configs, against load() of the edited text, and checks that both
+    build the same tree.
+
+    Args:
+        sizes_mb (List[float], optional): Config sizes in MB.
+
+    Returns:
+        List[dict]: One result row per size.
+    """
+    rows = []
+    for size_mb in sizes_mb:
+        text = synthetic_config(int(size_mb * 1_000_000))
+        nc = NginxConfig()
+        row = {"size_mb": len(text) / 1e6}
+        row["load_s"] = _time(lambda: nc.load(text))
+
+        middle = text.index("proxy_pass", len(text) // 2)
+        end = text.index(";", middle)
+        edited = text[:middle] + "proxy_pass http://backend/" + text[end:]
+        row["edit_value_s"] = _time(lambda: nc.reload(edited))
+
+        server = text.rindex("    server {", 0, len(text) // 2)
+        added = edited[:server] + server_block(-1) + edited[server:]
+        row["add_server_s"] = _time(lambda: nc.reload(added))
+
+        reference = NginxConfig()
+        reference.load(added)
+        row["same_tree"] = nc.data == reference.data
+        rows.append(row)
+    return rows
+
+
+def write_include_tree(root: str, n_files: int, servers_per_file: int):
+    """
+    Writes root/nginx.conf, whose http block includes conf.d/*.conf, and
+    n_files files of servers_per_file server blocks in conf.d.
+    """
+    os.makedirs(os.path.join(root, "conf.d"), exist_ok=True)
+    with open(os.path.join(root, "nginx.conf"), "w") as f:
+        f.write("worker_processes 4;\nhttp {\n"
+                "    include conf.d/*.conf;\n}\n")
+    for index in range(n_files):
+        path = os.path.join(root, "conf.d", f"site{index:04}.conf")
+        with open(path, "w") as f:
+            f.write("".join(
+                server_block(index * servers_per_file + server)
+                for server in range(servers_per_file)
+            ))
+
+
+def bench_includes(
+    n_files: int = 500, servers_per_file: int = 4, processes: int = None
+) -> List[dict]:
+    """
+    Times loadf_includes on a tree of n_files included files: cold with and
+    without a process pool, then again with nothing changed, with one file
+    touched and with one file edited. Loading every file by hand with
+    loadf is the baseline.
+
+    Args:
+        n_files (int, optional): Number of included files.
+        servers_per_file (int, optional): Server blocks per file.
+        processes (int, optional): Pool size, all CPUs by default.
+
+    Returns:
+        List[dict]: One result row per case.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as root:
+        write_include_tree(root, n_files, servers_per_file)
+        main = os.path.join(root, "nginx.conf")
+        paths = sorted(
+            os.path.join(root, "conf.d", name)
+            for name in os.listdir(os.path.join(root, "conf.d"))
+        )
+
+        def run(case: str, nc: NginxConfig, **kwargs):
+            parsed = []
+            seconds = _time(
+                lambda: parsed.append(nc.loadf_includes(main, **kwargs)))
+            rows.append({"case": case, "files": n_files + 1,
+                         "parsed": parsed[0], "seconds": seconds})
+
+        rows.append({
+            "case": "loadf each file", "files": n_files + 1,
+            "parsed": n_files + 1,
+            "seconds": _time(lambda: [
+                NginxConfig().loadf(path) for path in [main] + paths]),
+        })
+        run("cold, 1 process", NginxConfig(), processes=1)
+        nc = NginxConfig()
+        run("cold, pool", nc, processes=processes)
+        run("unchanged", nc)
+
+        os.utime(paths[n_files // 2])
+        run("one touched", nc)
+
+        with open(paths[n_files // 2], "a") as f:
+            f.write("server {\n    listen 8080;\n}\n")
+        run("one edited", nc)
+        reference = NginxConfig()
+        reference.loadf_includes(main, processes=1)
+        rows[-1]["same_tree"] = nc.data == reference.data
+    return rows
+
+
+def print_rows(title: str, rows: List[dict]):
+    print(f"== {title}")
+    for row in rows:
+        print("  ".join(
+            f"{key}={value:.3f}" if isinstance(value, float)
+            else f"{key}={value}"
+            for key, value in row.items()
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=float, nargs="+", default=SIZES_MB,
+        help="config sizes in MB",
+    )
+    parser.add_argument(
+        "--legacy-max-mb", type=float, default=100,
+        help="skip parse_block above this size",
+    )
+    parser.add_argument(
+        "--locations", type=int, default=10_000,
+        help="location blocks for the lookup benchmark",
+    )
+    parser.add_argument(
+        "--files", type=int, default=500,
+        help="included files for the include benchmark",
+    )
+    args = parser.parse_args()
+
+    print_rows(
+        "parse_block vs parse_config",
+        bench_parse(args.sizes, args.legacy_max_mb),
+    )
+    print_rows("reload after one-block edits", bench_reload(args.sizes))
+    print_rows("savef vs render by concatenation", bench_write(args.sizes))
+    print_rows("loadf_includes", bench_includes(args.files))
+    print_rows(
+        "get/set/remove through the index",
+        [bench_lookups(args.locations, args.locations)],
+    )
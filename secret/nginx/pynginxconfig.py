@@ -21,6 +21,189 @@ DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
 ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 ======================================================================================================
 '''
+import glob
+import hashlib
+import itertools
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# Rendered chunks (about a line each) joined per write call by write()
+WRITE_BATCH = 1024
+
+# One match per run of ordinary text or per character the parser reacts
+# to. Quoted strings and backslash escapes are ordinary text, so ';', '{',
+# '}', '#' and spaces inside them do not end a token.
+TOKEN_RE = re.compile(r'''
+      (?P<text>[^\n ;{}#'"\\]+)
+    | (?P<space>[ ]+)
+    | (?P<newline>\n)
+    | (?P<semicolon>;)
+    | (?P<open>\{)
+    | (?P<close>\})
+    | (?P<comment>\#[^\n]*\n?)
+    | (?P<quoted>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<escape>\\.)
+    | (?P<other>.)
+''', re.VERBOSE | re.DOTALL)
+
+# A whole 'name value;', 'name param {' or '}' statement without quotes,
+# escapes, comments or line breaks, tried first at every statement start
+STATEMENT_RE = re.compile(r'''
+    (?P<blank>\s*)
+    (?:
+        (?P<name>[^\s;{}#'"\\]+)[ ](?P<value>[^\n;{}#'"\\]*)(?P<end>[;{])
+      | (?P<close>\})
+    )
+''', re.VERBOSE)
+
+# Chunk size for comparing the loaded and the reloaded text
+COMPARE_CHUNK = 1 << 16
+
+
+def _common_prefix(a, b):
+    '''Length of the common prefix of the strings a and b.'''
+    n = min(len(a), len(b))
+    i = 0
+    step = COMPARE_CHUNK
+    while step:
+        while i + step <= n and a[i:i + step] == b[i:i + step]:
+            i += step
+        step //= 2
+    return i
+
+
+def _common_suffix(a, b, limit):
+    '''Length, at most limit, of the common suffix of the strings a and b.'''
+    i = 0
+    step = COMPARE_CHUNK
+    while step:
+        while (i + step <= limit and
+               a[len(a) - i - step:len(a) - i] ==
+               b[len(b) - i - step:len(b) - i]):
+            i += step
+        step //= 2
+    return i
+
+
+def _first_span(spans, region, count, field, value):
+    '''
+    Index of the first of the count nodes at region in spans whose start
+    (field 0) or end (field 1) is at least value.
+    '''
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if spans[region + 5 * mid + field] < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _shift_spans(spans, begin, end, delta):
+    '''Moves the nodes in spans[begin:end] by delta characters.'''
+    for i in range(begin, end, 5):
+        spans[i] += delta
+        spans[i + 1] += delta
+
+
+def _region_size(spans, region, count):
+    '''Size in spans of the count nodes at region and of all nested nodes.'''
+    size = 5 * count
+    for i in range(region, region + 5 * count, 5):
+        if spans[i + 3] >= 0:
+            size += _region_size(spans, spans[i + 3], spans[i + 4])
+    return size
+
+
+def _compact_spans(spans, region, count):
+    '''
+    Copies the count nodes at region and all nested nodes to a new array,
+    leaving out regions no longer in use. The nodes at region start at 0.
+    '''
+    compact = array('q')
+    pending = [(region, count, -1)]
+    while pending:
+        region, count, parent = pending.pop()
+        if parent >= 0:
+            compact[parent + 3] = len(compact)
+        start = len(compact)
+        compact.extend(spans[region:region + 5 * count])
+        for i in range(start, len(compact), 5):
+            if compact[i + 3] >= 0:
+                pending.append((compact[i + 3], compact[i + 4], i))
+    return compact
+
+
+def _include_patterns(nodes):
+    '''Patterns of the include directives in nodes, nested ones included.'''
+    patterns = []
+    for node in nodes:
+        if isinstance(node, tuple) and node[0] == 'include' and \
+                len(node) == 2 and isinstance(node[1], str):
+            patterns.append(node[1])
+        elif isinstance(node, dict):
+            patterns += _include_patterns(node['value'])
+    return patterns
+
+
+def _parse_file(job):
+    '''
+    Reads and parses the config file of a loadf_includes job, a path and the
+    content hash it had when it was last parsed. Runs in a worker process.
+    Returns the path, mtime and size of the file, its content hash, and its
+    tree and include patterns, or None for both when the content hash did
+    not change.
+    '''
+    path, digest = job
+    with open(path, 'r') as f:
+        stat = os.fstat(f.fileno())
+        conf = f.read()
+    new_digest = hashlib.sha1(
+        conf.encode('utf-8', 'surrogateescape')).hexdigest()
+    data = patterns = None
+    if new_digest != digest:
+        data = NginxConfig().parse_config(conf)
+        patterns = _include_patterns(data)
+    return path, stat.st_mtime_ns, stat.st_size, new_digest, data, patterns
+
+
+def _include_paths(prefix, pattern):
+    '''Absolute paths of the files an include pattern matches, sorted.'''
+    pattern = os.path.join(prefix, pattern)
+    if not any(char in pattern for char in '*?['):
+        return [os.path.abspath(pattern)]
+    return sorted(os.path.abspath(path) for path in glob.glob(pattern)
+                  if os.path.isfile(path))
+
+
+class _Pool:
+    '''
+    Maps over a pool of processes workers, all CPUs by default, started on
+    the first map with more than one job. Maps in this process when there
+    is a single worker.
+    '''
+    def __init__(self, processes):
+        self.processes = processes
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def map(self, func, jobs):
+        workers = self.processes or os.cpu_count() or 1
+        if len(jobs) < 2 or workers == 1:
+            return map(func, jobs)
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(workers)
+        return self.executor.map(
+            func, jobs, chunksize=max(1, len(jobs) // (4 * workers)))
 
 
 class NginxConfig:
@@ -30,14 +213,28 @@ class NginxConfig:
         self.config = ''
         self.data = []
         self.off_char = offset_char
+        # id(block list) -> [block list, shallow copy of it when indexed,
+        #                    {key: [[position hint, node], ...]}]
+        self._index = {}
+        # [spans of the nodes in self.config (see _parse), region and count
+        # of the top level nodes, size of the regions no longer in use], or
+        # None once the tree is modified
+        self._spans = None
+        # path -> [mtime, size, content hash, tree, include patterns] of the
+        # files read by loadf_includes
+        self._files = {}
 
     def __getitem__(self, index):
         return self.data[index]
 
     def __setitem__(self, index, value):
+        self._modified()
+        self._forget(self.data)
         self.data[index] = value
 
     def __delitem__(self, index):
+        self._modified()
+        self._forget(self.data)
         del self.data[index]
 
     def __call__(self):
@@ -59,7 +256,91 @@ class NginxConfig:
         else:
             return data
 
+    def _modified(self):
+        '''Forgets the spans the tree no longer matches.'''
+        self._spans = None
+
+    def reindex(self):
+        '''
+        Drops the lookup index. Lookups notice direct changes to a block
+        list (data[i] = ..., del, insert) by comparing it with a copy taken
+        when it was indexed, and a renamed block they find. Only renaming
+        another block in place onto a key that is looked up needs this.
+        '''
+        self._index = {}
+
+    def _key(self, node):
+        '''Index key of a node: parameter name, or (name, param) of a block.'''
+        if isinstance(node, tuple):
+            return node[0]
+        elif isinstance(node, dict):
+            return (node['name'], node['param'])
+        return None
+
+    def _index_block(self, data):
+        nodes = {}
+        for i, node in enumerate(data):
+            key = self._key(node)
+            if key is not None:
+                nodes.setdefault(key, []).append([i, node])
+        entry = self._index[id(data)] = [data, list(data), nodes]
+        return entry
+
+    def _entry(self, data):
+        entry = self._index.get(id(data))
+        # list == compares identical elements without calling __eq__, so
+        # this is a quick C loop unless data was changed behind our back
+        if entry is None or entry[0] is not data or entry[1] != data:
+            entry = self._index_block(data)
+        return entry
+
+    def _locate(self, data, key):
+        '''Position and first node of data with the given key, or None, None.'''
+        hits = self._entry(data)[2].get(key)
+        if hits:
+            hit = hits[0]
+            if not (hit[0] < len(data) and data[hit[0]] is hit[1]):
+                hit[0] = self._position(data, hit[1])  # moved, or gone
+            if hit[0] is None or self._key(hit[1]) != key:
+                # replaced or renamed behind our back
+                hits = self._index_block(data)[2].get(key)
+                if not hits:
+                    return None, None
+                hit = hits[0]
+            return hit[0], hit[1]
+        return None, None
+
+    def _position(self, data, node):
+        '''Position of node itself in data, or None.'''
+        try:
+            i = data.index(node)
+        except ValueError:
+            return None
+        return i if data[i] is node else None
+
+    def _find(self, data, key):
+        '''First node of the block list data with the given key, or None.'''
+        return self._locate(data, key)[1]
+
+    def _replace(self, data, i, old, new):
+        '''Replaces data[i], the node old, with new under the same key.'''
+        data[i] = new
+        entry = self._index.get(id(data))
+        if entry is not None and entry[0] is data and entry[1][i] is old:
+            entry[1][i] = new
+            for hit in entry[2].get(self._key(old), []):
+                if hit[1] is old:
+                    hit[1] = new
+
+    def _forget(self, data):
+        '''Drops the index of a block list and of the blocks nested in it.'''
+        if self._index.pop(id(data), None) is not None:
+            for node in data:
+                if isinstance(node, dict):
+                    self._forget(node['value'])
+
     def set(self, item_arr, value=None, param=None, name=None):
+        self._modified()
         if isinstance(item_arr, str):
             elem = item_arr
             parent = self.data
@@ -75,37 +356,34 @@ class NginxConfig:
 
         if isinstance(elem, str) and isinstance(value, str):
             # modifying text parameter
-            for i, param in enumerate(parent):
-                if isinstance(param, tuple):
-                    if param[0] == elem:
-                        if value is not None and name is not None:
-                            parent[i] = (name, value)
-                            return
-                        elif value is not None:
-                            parent[i] = (param[0], value)
-                            return
-                        elif name is not None:
-                            parent[i] = (name, param[1])
-                            return
-                        raise TypeError('Not expected value type')
+            i, node = self._locate(parent, elem)
+            if node is not None:
+                if name is not None:
+                    parent[i] = (name, value)
+                    self._forget(parent)
+                else:
+                    self._replace(parent, i, node, (node[0], value))
+                return
 
         elif isinstance(elem, tuple):
             # modifying block
             if len(elem) == 1:
                 elem = (elem[0], '')
-            for i, block in enumerate(parent):
-                if isinstance(block, dict):
-                    if elem == (block['name'], block['param']):
-                        if value is not None and isinstance(value, list):
-                            parent[i]['value'] = value
-                            return
-                        if param is not None and isinstance(param, str):
-                            parent[i]['param'] = param
-                            return
-                        if name is not None and isinstance(name, str):
-                            parent[i]['name'] = name
-                            return
-                        raise TypeError('Not expected value type')
+            block = self._find(parent, elem)
+            if block is not None:
+                if value is not None and isinstance(value, list):
+                    self._forget(block['value'])
+                    block['value'] = value
+                    return
+                if param is not None and isinstance(param, str):
+                    block['param'] = param
+                    self._forget(parent)
+                    return
+                if name is not None and isinstance(name, str):
+                    block['name'] = name
+                    self._forget(parent)
+                    return
+                raise TypeError('Not expected value type')
         raise KeyError('No such parameter.')
 
     def get(self, item_arr, data=[]):
@@ -121,38 +399,39 @@ class NginxConfig:
                 if isinstance(element, tuple):  # cannot be a string
                     if len(element) == 1:
                         element = (element[0], '')
-                    for i, data_elem in enumerate(data):
-                        if isinstance(data_elem, dict):
-                            if (data_elem['name'], data_elem['param']) == element:
-                                return self.get(item_arr, self.get_value(data[i]))
+                    block = self._find(data, element)
+                    if block is not None:
+                        return self.get(item_arr, self.get_value(block))
 
         if not 'item' in locals():
             raise KeyError('Error while getting parameter.')
-        if isinstance(item, str):
-            for i, elem in enumerate(data):
-                if isinstance(elem, tuple):
-                    if elem[0] == item:
-                        return data[i]
-        elif isinstance(item, tuple):
-            if len(item) == 1:
-                item = (item[0], '')
-            for i, elem in enumerate(data):
-                if isinstance(elem, dict):
-                    if (elem['name'], elem['param']) == item:
-                        return data[i]
+        if isinstance(item, tuple) and len(item) == 1:
+            item = (item[0], '')
+        if isinstance(item, (str, tuple)):
+            return self._find(data, item)
         return None
 
     def append(self, item, root=[], position=None):
+        self._modified()
         if root == []:
             root = self.data
         elif root is None:
             raise AttributeError('Root element is None')
         if position:
             root.insert(position, item)
-        else:
-            root.append(item)
+            self._forget(root)
+            return
+        root.append(item)
+        entry = self._index.get(id(root))
+        if entry is not None and entry[0] is root:
+            # a stale copy stays different from root and is rebuilt later
+            entry[1].append(item)
+            key = self._key(item)
+            if key is not None:
+                entry[2].setdefault(key, []).append([len(root) - 1, item])
 
     def remove(self, item_arr, data=[]):
+        self._modified()
         if data == []:
             data = self.data
         if type(item_arr) in [str, tuple]:
@@ -166,42 +445,410 @@ class NginxConfig:
                     self.remove(item_arr, self.get_value(self.get(elem, data)))
                     return
 
-        if isinstance(item, str):
-            for i, elem in enumerate(data):
-                if isinstance(elem, tuple):
-                    if elem[0] == item:
-                        del data[i]
-                        return
-        elif isinstance(item, tuple):
-            if len(item) == 1:
-                item = (item[0], '')
-            for i, elem in enumerate(data):
-                if isinstance(elem, dict):
-                    if (elem['name'], elem['param']) == item:
-                        del data[i]
-                        return
-        else:
+        if isinstance(item, tuple) and len(item) == 1:
+            item = (item[0], '')
+        elif not isinstance(item, (str, tuple)):
             raise AttributeError(
                 "Unknown item type '%s' in item_arr" % item.__class__.__name__)
-        raise KeyError('Unable to remove')
+        i, node = self._locate(data, item)
+        if node is None:
+            raise KeyError('Unable to remove')
+        del data[i]
+        entry = self._index[id(data)]
+        del entry[1][i]
+        hits = entry[2][item]
+        del hits[0]  # positions after i are off by one until looked up
+        if not hits:
+            del entry[2][item]
+        if isinstance(node, dict):
+            self._forget(node['value'])
 
     def load(self, config):
         self.config = config
-        self.length = len(config) - 1
+        self.length = len(config)
         self.i = 0
-        self.data = self.parse_block()
+        spans = array('q')
+        self.data, top, clean = self._parse(config, 0, self.length, 0, spans)
+        if clean:
+            self._spans = [spans, len(spans), len(self.data), 0]
+            spans.extend(top)
+        else:
+            self._spans = None
+        self._index = {}
+
+    def reload(self, config):
+        '''
+        Loads config, an edited version of the loaded text, re-parsing only
+        the statements around the part that changed. The change is located
+        in the innermost block that contains all of it, and the statements
+        of that block it touches are parsed again and spliced in; every
+        other node is kept as it is.
+
+        Falls back to a full load when the tree was modified through set,
+        append, remove or a subclass calling _modified since it was loaded,
+        when the change leaves a statement or block unterminated, or when
+        the loaded text did not parse cleanly. Returns True when only part
+        of the text was parsed.
+
+        Other direct changes to data are only noticed when they change the
+        length of the top level or of a block the change is located in;
+        after those, call load instead.
+        '''
+        old = self.config
+        if self._spans is None or len(self.data) != self._spans[2]:
+            self.load(config)
+            return False
+        spans, region, count, unused = self._spans
+        data = self.data
+        prefix = _common_prefix(old, config)
+        if prefix == len(old) == len(config):
+            return True
+        suffix = _common_suffix(old, config,
+                                min(len(old), len(config)) - prefix)
+        changed_end = len(old) - suffix
+        delta = len(config) - len(old)
+
+        # innermost block whose body holds all of old[prefix:changed_end]
+        path = []
+        base, body_start, body_end = 0, 0, len(old)
+        while True:
+            first = _first_span(spans, region, count, 1, prefix - base + 1)
+            last = _first_span(spans, region, count, 0, changed_end - base)
+            if last - first != 1 or not isinstance(data[first], dict):
+                break
+            at = region + 5 * first
+            start, end, body, children, n_children = spans[at:at + 5]
+            start += base
+            end += base
+            if not (start + body <= prefix and changed_end <= end - 1):
+                break
+            path.append((data, region, count, first, base, body_start,
+                         body_end))
+            data = data[first]['value']
+            if len(data) != n_children:
+                self.load(config)
+                return False
+            region, count = children, n_children
+            base, body_start, body_end = start, start + body, end - 1
+
+        # re-parse from the end of the statement before the change to the
+        # start of the one after it, or else the whole enclosing block
+        while True:
+            if first:
+                segment_start = base + spans[region + 5 * first - 4]
+            else:
+                segment_start = body_start
+            if last < count:
+                segment_end = base + spans[region + 5 * last] + delta
+            else:
+                segment_end = body_end + delta
+            size = len(spans)
+            nodes, node_spans, clean = self._parse(config, segment_start,
+                                                   segment_end, base, spans)
+            if clean:
+                break
+            unused += len(spans) - size
+            if not path:
+                self.load(config)
+                return False
+            data, region, count, first, base, body_start, body_end = \
+                path.pop()
+            last = first + 1
+
+        removed = data[first:last]
+        data[first:last] = nodes
+        unused += _region_size(spans, region + 5 * first, last - first)
+        unused -= 5 * (last - first)
+        new_count = count - (last - first) + len(nodes)
+        if new_count == count:
+            spans[region + 5 * first:region + 5 * last] = \
+                array('q', node_spans)
+        else:  # the nodes no longer fit, move them to the end
+            unused += 5 * count
+            new_region = len(spans)
+            spans.extend(spans[region:region + 5 * first])
+            spans.extend(node_spans)
+            spans.extend(spans[region + 5 * last:region + 5 * count])
+            region, count = new_region, new_count
+            if path:
+                parent, index = path[-1][1], path[-1][3]
+                spans[parent + 5 * index + 3] = region
+                spans[parent + 5 * index + 4] = count
+            else:
+                self._spans[1:3] = [region, count]
+        _shift_spans(spans, region + 5 * (first + len(nodes)),
+                     region + 5 * count, delta)
+        for _, parent, parent_count, index, _, _, _ in reversed(path):
+            spans[parent + 5 * index + 1] += delta
+            _shift_spans(spans, parent + 5 * (index + 1),
+                         parent + 5 * parent_count, delta)
+
+        if unused > len(spans) // 2:
+            region, count = self._spans[1:3]
+            spans = _compact_spans(spans, region, count)
+            self._spans = [spans, 0, count, 0]
+        else:
+            self._spans[3] = unused
+
+        self._index.pop(id(data), None)
+        for node in removed:
+            if isinstance(node, dict):
+                self._forget(node['value'])
+        self.config = config
+        self.length = len(config)
+        return True
 
     def loadf(self, filename):
         with open(filename, 'r') as f:
             conf = f.read()
             self.load(conf)
 
+    def reloadf(self, filename):
+        '''Reloads the config from filename, see reload.'''
+        with open(filename, 'r') as f:
+            return self.reload(f.read())
+
+    def loadf_includes(self, filename, prefix=None, processes=None):
+        '''
+        Loads filename and every file it includes into one tree, each
+        include directive being replaced by the nodes of the files its
+        pattern matches, in sorted order. Relative patterns are resolved
+        against prefix, the directory of filename by default, as nginx does.
+
+        Files are parsed in a pool of processes worker processes, all CPUs
+        by default, and kept by path. A file is read again only when its
+        mtime or size changed, and parsed again only when its content hash
+        changed too. Returns the number of files parsed.
+
+        The combined tree is a copy, so changing it never changes the cache.
+        It has no spans, and reload falls back to a full load.
+        '''
+        filename = os.path.abspath(filename)
+        if prefix is None:
+            prefix = os.path.dirname(filename)
+        files = self._files
+        matches = {}  # include pattern -> paths
+        parsed = 0
+        pending = [filename]
+        seen = set(pending)
+        with _Pool(processes) as pool:
+            while pending:
+                jobs = []
+                for path in pending:
+                    stat = os.stat(path)
+                    entry = files.get(path)
+                    if entry is None or \
+                            entry[:2] != [stat.st_mtime_ns, stat.st_size]:
+                        jobs.append((path, entry[2] if entry else None))
+                for path, mtime, size, digest, data, patterns in \
+                        pool.map(_parse_file, jobs):
+                    if data is None:  # touched, but the same content
+                        files[path][:3] = [mtime, size, digest]
+                    else:
+                        files[path] = [mtime, size, digest, data, patterns]
+                        parsed += 1
+
+                found = []
+                for path in pending:
+                    for pattern in files[path][4]:
+                        if pattern not in matches:
+                            matches[pattern] = _include_paths(prefix, pattern)
+                        for included in matches[pattern]:
+                            if included not in seen:
+                                seen.add(included)
+                                found.append(included)
+                pending = found
+
+        self.data = self._combine(filename, matches, [])
+        self.config = ''
+        self.length = 0
+        self._spans = None
+        self._index = {}
+        for path in list(files):
+            if path not in seen:
+                del files[path]
+        return parsed
+
+    def _combine(self, path, matches, including):
+        '''
+        Copy of the tree of the file at path with its include directives
+        replaced by copies of the trees of the included files. The copies
+        keep the file cache safe from changes made to the combined tree.
+        '''
+        return self._combine_nodes(self._files[path][3], matches,
+                                   including + [path])
+
+    def _combine_nodes(self, nodes, matches, including):
+        combined = []
+        for node in nodes:
+            if isinstance(node, tuple):
+                if node[0] == 'include' and len(node) == 2 and \
+                        isinstance(node[1], str):
+                    for path in matches[node[1]]:
+                        if path in including:
+                            raise ValueError(
+                                'Recursive include of %s' % path)
+                        combined += self._combine(path, matches, including)
+                elif len(node) == 2 and isinstance(node[1], list):
+                    combined.append((node[0], list(node[1])))  # multiline
+                else:
+                    combined.append(node)
+            elif isinstance(node, dict):
+                combined.append({
+                    'name': node['name'], 'param': node['param'],
+                    'value': self._combine_nodes(node['value'], matches,
+                                                 including)})
+            else:
+                combined.append(node)
+        return combined
+
     def savef(self, filename):
         with open(filename, 'w') as f:
-            conf = self.gen_config()
-            f.write(conf)
+            self.write(f)
+
+    def parse_config(self, config):
+        '''
+        Parse config text into the data tree, a token at a time.
+
+        Builds the same tree as parse_block but matches whole simple
+        statements with STATEMENT_RE, and runs of text with TOKEN_RE,
+        instead of one character per loop. Nesting is kept on an
+        explicit stack. Quoted strings and escaped characters such as \\{
+        are kept verbatim as part of the value.
+        '''
+        return self._parse(config, 0, len(config), 0, array('q'))[0]
+
+    def _parse(self, config, pos, end, base, spans):
+        '''
+        Parses config[pos:end] as parse_config does. Returns the nodes, a list
+        of their spans and whether the text ended between statements with
+        every block closed.
+
+        The span of a node is five integers: its start and end, then for a
+        block the offset of its body from its start and the region and count
+        of the spans of its nodes, for a parameter 0, -1 and 0. Offsets are
+        relative to the start of the enclosing block, or to base at the top.
+        The spans of the nodes of a block are appended to the array spans
+        when the block closes, one contiguous region per block, so that the
+        garbage collector has a single object to walk instead of one per
+        block.
+        '''
+        stack = []
+        data = []
+        nodes = []
+        param_name = None
+        param_value = None
+        buf = ''
+        start = pos
+        clean = True
+        statement_match = STATEMENT_RE.match
+        token_match = TOKEN_RE.match
+        while pos < end:
+            if param_name is None and not buf.strip():
+                match = statement_match(config, pos, end)
+                if match:
+                    blank, name, value, end_char, close = match.groups()
+                    start = pos + len(blank)
+                    pos = match.end()
+                    buf = ''
+                    if close:
+                        if not stack:
+                            clean = False
+                            break
+                        children = nodes
+                        data, nodes, base = stack.pop()
+                        nodes[-4] = pos - base
+                        nodes[-2] = len(spans)
+                        nodes[-1] = len(children) // 5
+                        spans.extend(children)
+                    elif end_char == ';':
+                        data.append((name, value.strip()))
+                        nodes += (start - base, pos - base, 0, -1, 0)
+                    else:
+                        block = {'name': name, 'param': value.strip(),
+                                 'value': []}
+                        data.append(block)
+                        nodes += (start - base, -1, pos - start, -1, 0)
+                        stack.append((data, nodes, base))
+                        data, nodes, base = block['value'], [], start
+                    continue
+
+            match = token_match(config, pos, end)
+            kind = match.lastgroup
+            if (param_name is None and not buf.strip() and
+                    kind not in ('space', 'newline', 'comment')):
+                # first token of a statement, which starts at its first
+                # non-blank character as with STATEMENT_RE
+                token = match.group()
+                if token.strip():
+                    start = pos + len(token) - len(token.lstrip())
+            pos = match.end()
+            if kind == 'space':
+                if not param_name and buf.strip():
+                    param_name = buf.strip()
+                    buf = match.group()[1:]
+                else:
+                    buf += match.group()
+            elif kind == 'newline':  # multiline value
+                if buf and param_name:
+                    if param_value is None:
+                        param_value = []
+                    param_value.append(buf.strip())
+                    buf = ''
+            elif kind == 'semicolon':
+                if isinstance(param_value, list):
+                    param_value.append(buf.strip())
+                else:
+                    param_value = buf.strip()
+                if param_name:
+                    data.append((param_name, param_value))
+                else:
+                    data.append((param_value,))
+                nodes += (start - base, pos - base, 0, -1, 0)
+                param_name = None
+                param_value = None
+                buf = ''
+            elif kind == 'open':
+                block = {'name': param_name, 'param': buf.strip(), 'value': []}
+                data.append(block)
+                nodes += (start - base, -1, pos - start, -1, 0)
+                stack.append((data, nodes, base))
+                data, nodes, base = block['value'], [], start
+                param_name = None
+                param_value = None
+                buf = ''
+            elif kind == 'close':
+                if not stack:  # unbalanced, parse_block stops here too
+                    clean = False
+                    break
+                children = nodes
+                data, nodes, base = stack.pop()
+                nodes[-4] = pos - base
+                nodes[-2] = len(spans)
+                nodes[-1] = len(children) // 5
+                spans.extend(children)
+                param_name = None
+                param_value = None
+                buf = ''
+            elif kind == 'comment':
+                if pos == end < len(config) and \
+                        not match.group().endswith('\n'):
+                    clean = False  # may go on past end
+            else:
+                if kind == 'other' and match.group() in '"\'':
+                    clean = False  # unterminated quote, may close past end
+                buf += match.group()
+        if stack:
+            data, nodes = stack[0][:2]
+            clean = False
+        clean = clean and param_name is None and not buf.strip()
+        return data, nodes, clean
 
     def parse_block(self):
+        '''
+        Character at a time parser, superseded by parse_config which load
+        uses. Parses self.config from self.i up to self.length.
+        '''
         data = []
         param_name = None
         param_value = None
@@ -250,46 +897,63 @@ class NginxConfig:
             self.i += 1
         return data
 
-    def gen_block(self, blocks, offset):
-        subrez = ''  # ready to return string
-        block_name = None
-        block_param = ''
+    def iter_block(self, blocks, offset):
+        '''
+        Yields the rendered text of blocks chunk by chunk, one line or less
+        at a time, so that nothing larger than a line is built in memory.
+        '''
+        indent = self.off_char * offset
+        emitted = False
         for i, block in enumerate(blocks):
             if isinstance(block, tuple):
                 if len(block) == 1 and type(block[0]) == str:  # single param
-                    subrez += self.off_char * offset + '%s;\n' % (block[0])
+                    yield indent + '%s;\n' % (block[0])
                 elif isinstance(block[1], str):
-                    subrez += self.off_char * offset + \
-                        '%s %s;\n' % (block[0], block[1])
+                    yield indent + '%s %s;\n' % (block[0], block[1])
                 else:  # multiline
-                    subrez += self.off_char * offset + '%s %s;\n' % (block[0],
-                                                                     self.gen_block(block[1], offset + len(block[0]) + 1))
+                    yield indent + '%s ' % (block[0])
+                    yield from self.iter_block(block[1],
+                                               offset + len(block[0]) + 1)
+                    yield ';\n'
+                emitted = True
 
             elif isinstance(block, dict):
-                block_value = self.gen_block(block['value'], offset + 4)
                 if block['param']:
                     param = block['param'] + ' '
                 else:
                     param = ''
-                if subrez != '':
-                    subrez += '\n'
-                subrez += '%(offset)s%(name)s %(param)s{\n%(data)s%(offset)s}\n' % {
-                    'offset': self.off_char * offset, 'name': block['name'], 'data': block_value,
-                    'param': param}
+                if emitted:
+                    yield '\n'
+                yield '%s%s %s{\n' % (indent, block['name'], param)
+                yield from self.iter_block(block['value'], offset + 4)
+                yield indent + '}\n'
+                emitted = True
 
             elif isinstance(block, str):  # multiline params
                 if i == 0:
-                    subrez += '%s\n' % block
+                    yield '%s\n' % block
                 else:
-                    subrez += '%s%s\n' % (self.off_char * offset, block)
+                    yield '%s%s\n' % (indent, block)
+                emitted = True
 
-        if block_name:
-            return '%(offset)s%(name)s %(param)s{\n%(data)s%(offset)s}\n' % {
-                'offset': self.off_char * offset, 'name': block_name, 'data': subrez,
-                'param': block_param}
-        else:
-            return subrez
+    def gen_block(self, blocks, offset):
+        return ''.join(self.iter_block(blocks, offset))
 
-    def gen_config(self, offset_char=' '):
+    def iter_config(self, offset_char=' '):
         self.off_char = offset_char
-        return self.gen_block(self.data, 0)
+        return self.iter_block(self.data, 0)
+
+    def gen_config(self, offset_char=' '):
+        return ''.join(self.iter_config(offset_char))
+
+    def write(self, f, offset_char=' '):
+        '''
+        Writes the config to the file object f as it is rendered, a batch of
+        WRITE_BATCH chunks per write call.
+        '''
+        chunks = self.iter_config(offset_char)
+        while True:
+            batch = ''.join(itertools.islice(chunks, WRITE_BATCH))
+            if not batch:
+                break
+            f.write(batch)
@@ -24,6 +24,7 @@ class TNginxConfig(NginxConfig):
     # def append_value(self, name: str, rule: List[tuple]) -> None:
     def append_value(self, name: str, rule: tuple) -> None:
         """append location proxy rule"""
+        self._modified()  # edits data directly, reload must load in full
         new_rule = {'name': 'location'}
         new_data_list = self.data
         for key, item in new_data_list[0].items():
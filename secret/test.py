@@ -1,48 +1,315 @@
+import bisect
+import json
 import os
+import re
 import shutil
-from git import Repo
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from git import GitCommandError, Repo
 from deepdiff import DeepDiff
 
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class FileDiff:
+    """
+    Start of one file in a diff.
+    :param file: Last token of the "diff --git" line, e.g. "b/src/a.txt".
+    :param header: The "diff --git" line.
+    """
+    __slots__ = ("file", "header", "extended")
+
+    def __init__(self, file, header):
+        self.file = file
+        self.header = header
+        self.extended = []  # index, mode, rename, ---/+++ and Binary lines
+
+    def __repr__(self):
+        return f"FileDiff(file={self.file!r})"
+
+
+class Hunk:
+    """
+    One hunk of a file diff with its parsed line ranges.
+    :param file: Same as FileDiff.file of the file it belongs to.
+    :param header: The "@@ ... @@" line.
+    """
+    __slots__ = (
+        "file", "header", "old_start", "old_count", "new_start", "new_count",
+        "lines",
+    )
+
+    def __init__(self, file, header):
+        self.file = file
+        self.header = header
+        match = HUNK_HEADER.match(header)
+        old_start, old_count, new_start, new_count = match.groups()
+        self.old_start = int(old_start)
+        self.old_count = 1 if old_count is None else int(old_count)
+        self.new_start = int(new_start)
+        self.new_count = 1 if new_count is None else int(new_count)
+        self.lines = []  # raw lines with their "+", "-" or " " prefix
+
+    @property
+    def changes(self):
+        kinds = {"+": "addition", "-": "deletion", " ": "context"}
+        return [{"type": kinds[line[0]], "line": line} for line in self.lines]
+
+    def __repr__(self):
+        return (
+            f"Hunk(file={self.file!r}, old={self.old_start},{self.old_count}, "
+            f"new={self.new_start},{self.new_count})"
+        )
+
+
+def iter_parse_diff(lines):
+    """
+    Parse git diff output incrementally.
+    Yields a FileDiff when a file starts, then each Hunk of it once the hunk
+    is complete, so only one hunk is held in memory at a time.
+    :param lines: Iterable of diff lines, with or without line endings.
+    """
+    file = None
+    hunk = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.startswith("diff --git"):
+            if hunk is not None:
+                yield hunk
+                hunk = None
+            file = FileDiff(line.split(" ")[-1], line)
+            yield file
+        elif file is None:
+            continue
+        elif line.startswith("@@"):
+            if hunk is not None:
+                yield hunk
+            hunk = Hunk(file.file, line)
+        elif hunk is None:
+            file.extended.append(line)
+        elif line.startswith(("+", "-", " ")):
+            hunk.lines.append(line)
+    if hunk is not None:
+        yield hunk
+
+
+class DiffIndex:
+    """
+    Hunk line ranges of the diff between two commits, for queries without
+    running git again. Hunk records are returned without their lines.
+    :param old_sha: Commit SHA of the old side.
+    :param new_sha: Commit SHA of the new side.
+    :param files: Dict of path -> list of Hunk, sorted by line.
+    """
+
+    def __init__(self, old_sha, new_sha, files):
+        self.old_sha = old_sha
+        self.new_sha = new_sha
+        self.files = files
+        self._paths = sorted(files)
+        self._ends = {}
+
+    @staticmethod
+    def _path(file):
+        return file[2:] if file.startswith("b/") else file
+
+    @classmethod
+    def from_records(cls, old_sha, new_sha, records):
+        """
+        Build the index from iter_parse_diff records.
+        :param records: FileDiff and Hunk records.
+        """
+        files = {}
+        for record in records:
+            if isinstance(record, FileDiff):
+                files.setdefault(cls._path(record.file), [])
+            else:
+                record.lines = []
+                files[cls._path(record.file)].append(record)
+        return cls(old_sha, new_sha, files)
+
+    def changed_files(self, prefix=""):
+        """
+        Changed files under a folder prefix, sorted.
+        :param prefix: Folder, e.g. "switch_status/".
+        """
+        start = bisect.bisect_left(self._paths, prefix)
+        end = start
+        while end < len(self._paths) and self._paths[end].startswith(prefix):
+            end += 1
+        return self._paths[start:end]
+
+    def hunks_touching(self, path, first_line, last_line, side="new"):
+        """
+        Hunks of a file whose line range overlaps first_line..last_line.
+        :param path: Path of the file.
+        :param first_line: First line of the range, 1-based.
+        :param last_line: Last line of the range, inclusive.
+        :param side: "new" for lines of new_sha, "old" for old_sha.
+        """
+        hunks = self.files.get(path, [])
+        key = (path, side)
+        if key not in self._ends:
+            self._ends[key] = [
+                self._range(hunk, side)[1] for hunk in hunks
+            ]
+        # Hunks do not overlap, so their ends are sorted like their starts
+        index = bisect.bisect_left(self._ends[key], first_line)
+        touching = []
+        while index < len(hunks):
+            start, _ = self._range(hunks[index], side)
+            if start > last_line:
+                break
+            touching.append(hunks[index])
+            index += 1
+        return touching
+
+    @staticmethod
+    def _range(hunk, side):
+        if side == "new":
+            start, count = hunk.new_start, hunk.new_count
+        else:
+            start, count = hunk.old_start, hunk.old_count
+        return start, start + max(count, 1) - 1
+
+    def to_dict(self):
+        return {
+            "old_sha": self.old_sha,
+            "new_sha": self.new_sha,
+            "files": {
+                path: [[hunk.file, hunk.header] for hunk in hunks]
+                for path, hunks in self.files.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["old_sha"], data["new_sha"], {
+            path: [Hunk(file, header) for file, header in hunks]
+            for path, hunks in data["files"].items()
+        })
+
+
 class GitHandler:
-    def __init__(self, repo_url, destination_path, gitlab_access_token):
+    def __init__(
+        self, repo_url, destination_path, gitlab_access_token, depth=None,
+        partial=False, sparse_paths=None,
+    ):
+        """
+        :param repo_url: URL of the remote repository.
+        :param destination_path: Local path of the checkout.
+        :param gitlab_access_token: Token used for pushing.
+        :param depth: Clone and fetch only the last depth commits.
+        :param partial: Partial clone with --filter=blob:none, blobs are
+            fetched on demand when they are checked out.
+        :param sparse_paths: Only check out these folders (cone mode).
+        """
         self.repo_url = repo_url
         self.destination_path = destination_path
         self.gitlab_access_token = gitlab_access_token
+        self.depth = depth
+        self.partial = partial
+        self.sparse_paths = list(sparse_paths) if sparse_paths else None
+        self._touched_paths = set()  # journal for incremental commits
+        self._diff_indexes = {}
 
     def clone_or_pull_repository(self):
         """
         Clone the Git repository if it doesn't exist locally, or pull changes if it does.
+        Clones honour depth, partial and sparse_paths, later pulls keep them.
+        A shallow clone still fetches every branch, so other branches can be
+        diffed against or checked out in a worktree. Pulls into a shallow
+        clone only fast-forward, so a diverged local branch raises
+        GitCommandError instead of a merge that the missing history breaks.
         """
         if not os.path.exists(self.destination_path):
             print("clone repository")
-            Repo.clone_from(self.repo_url, self.destination_path)
+            options = {}
+            if self.depth:
+                options["depth"] = self.depth
+                # depth implies --single-branch, keep the other branches
+                options["no_single_branch"] = True
+            if self.partial:
+                options["filter"] = "blob:none"
+            if self.sparse_paths:
+                options["no_checkout"] = True
+            repo = Repo.clone_from(
+                self.repo_url, self.destination_path, **options
+            )
+            if self.sparse_paths:
+                repo.git.sparse_checkout("set", "--cone", *self.sparse_paths)
+                repo.git.checkout()
         else:
             print("pull repository")
             repo = Repo(self.destination_path)
             origin = repo.remote()
-            origin.pull()
+            if self.depth:
+                # A shallow clone fetches only the new commits down to its
+                # shallow boundary, passing depth again would cut the link
+                # to the local head and make fast-forwarding impossible
+                origin.pull(ff_only=True)
+            else:
+                origin.pull()
 
-    def commit_and_push_changes(self, commit_message, target_branch):
+    def mark_changed(self, *paths):
         """
-        Commit changes and push them to a remote repository.
-        :param commit_message: Message for the commit.
-        :param target_branch: Name of the branch to push changes.
+        Record paths changed outside of GitHandler, so that an incremental
+        commit stages them.
+        :param paths: Paths relative to destination_path, files or folders.
+        """
+        for path in paths:
+            self._touched_paths.add(os.path.normpath(path))
+
+    def _stage_touched_paths(self, repo):
+        """
+        Stage only the journaled paths: additions and edits with git add,
+        removals with git rm --cached, so git never scans the work tree.
+        """
+        existing, missing = [], []
+        for path in sorted(self._touched_paths):
+            full_path = os.path.join(self.destination_path, path)
+            pathspec = f":(literal){path}"
+            (existing if os.path.lexists(full_path) else missing).append(
+                pathspec
+            )
+        with tempfile.TemporaryDirectory() as tmp:
+            for pathspecs, command, options in (
+                (existing, repo.git.add, ["--all"]),
+                (missing, repo.git.rm, ["-r", "-q", "--cached",
+                                        "--ignore-unmatch"]),
+            ):
+                if not pathspecs:
+                    continue
+                pathspec_file = os.path.join(tmp, "pathspecs")
+                with open(pathspec_file, "w") as f:
+                    f.write("\0".join(pathspecs))
+                command(
+                    *options,
+                    f"--pathspec-from-file={pathspec_file}",
+                    "--pathspec-file-nul",
+                )
+
+    def _commit_index(self, repo, commit_message):
+        """
+        Commit the index with plumbing commands, which only rewrite the
+        trees of changed folders. Returns False if nothing is staged.
+        Commit hooks are not run.
+        """
+        tree = repo.git.write_tree()
+        head = repo.git.rev_parse("HEAD")
+        if tree == repo.git.rev_parse("HEAD^{tree}"):
+            return False
+        commit = repo.git.commit_tree(tree, "-p", head, "-m", commit_message)
+        repo.git.update_ref("HEAD", commit, head)
+        return True
+
+    def _set_token_url(self, repo):
+        """
+        Put the access token into the origin URL. The config is only written
+        when the URL changes, as worktrees of one checkout share it.
         """
-        repo = Repo(self.destination_path)
-        print(f"{repo=}")
-    
-        # Add all changes to the index, including untracked files
-        repo.git.add("--all")
-    
-        # Check if there are changes to commit
-        if not repo.is_dirty():
-            print("No changes to commit.")
-            return
-    
-        # Commit changes
-        repo.index.commit(commit_message)
-    
-        # Push changes to remote repository with access token in URL
         origin_url = repo.remote().url
         print("/*" * 20)
         print(f"{origin_url=}")
@@ -54,7 +321,43 @@ class GitHandler:
             if "oauth2" not in origin_url
             else origin_url
         )
-        repo.remote().set_url(new_origin_url)
+        if new_origin_url != origin_url:
+            repo.remote().set_url(new_origin_url)
+
+    def commit_and_push_changes(
+        self, commit_message, target_branch, incremental=False
+    ):
+        """
+        Commit changes and push them to a remote repository.
+        :param commit_message: Message for the commit.
+        :param target_branch: Name of the branch to push changes.
+        :param incremental: Stage only the paths touched through add_file,
+            delete_file, add_folder, delete_folder and mark_changed, and
+            skip the scan of the whole work tree. Other outside edits are
+            not committed. Commit hooks are not run in this mode.
+        """
+        repo = Repo(self.destination_path)
+        print(f"{repo=}")
+
+        if incremental:
+            self._stage_touched_paths(repo)
+            committed = self._commit_index(repo, commit_message)
+        else:
+            # Add all changes to the index, including untracked files
+            repo.git.add("--all")
+
+            # Check if there are changes to commit
+            committed = repo.is_dirty()
+            if committed:
+                repo.index.commit(commit_message)
+        self._touched_paths.clear()
+
+        if not committed:
+            print("No changes to commit.")
+            return
+    
+        # Push changes to remote repository with access token in URL
+        self._set_token_url(repo)
         origin = repo.remote(name="origin")
         try:
             origin.push(refspec=f"{target_branch}:{target_branch}")
@@ -74,6 +377,7 @@ class GitHandler:
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
         with open(full_path, "w") as file:
             file.write(content)
+        self.mark_changed(file_path)
 
     def delete_file(self, file_path):
         """
@@ -83,6 +387,7 @@ class GitHandler:
         full_path = os.path.join(self.destination_path, file_path)
         if os.path.exists(full_path):
             os.remove(full_path)
+            self.mark_changed(file_path)
         else:
             print(f"File '{file_path}' does not exist.")
 
@@ -92,6 +397,7 @@ class GitHandler:
         :param folder_path: Path of the folder to add.
         """
         os.makedirs(os.path.join(self.destination_path, folder_path), exist_ok=True)
+        self.mark_changed(folder_path)
 
     def delete_folder(self, folder_path):
         """
@@ -101,6 +407,7 @@ class GitHandler:
         folder_to_delete = os.path.join(self.destination_path, folder_path)
         if os.path.exists(folder_to_delete):
             shutil.rmtree(folder_to_delete)
+            self.mark_changed(folder_path)
         else:
             print(f"Folder '{folder_path}' does not exist.")
 
@@ -153,49 +460,315 @@ class GitHandler:
     def parse_diff_output(self, diff_output):
         """
         Parse the output of git diff command.
-        :param diff_output: Output of git diff command.
+        :param diff_output: Output of git diff command, a string or an
+            iterable of lines.
         :return: Parsed diff output.
         """
+        if isinstance(diff_output, str):
+            diff_output = diff_output.splitlines()
         parsed_diff = []
-        current_change = None
-        current_chunk = None
-        
-        lines = diff_output.splitlines()
-        for line in lines:
-            if line.startswith("diff --git"):
-                if current_change is not None:
-                    parsed_diff.append(current_change)
-                current_change = {"file": line.split(" ")[-1], "chunks": []}
-            elif line.startswith("@@") and current_change is not None:
-                current_chunk = {"header": line, "changes": []}
-                current_change["chunks"].append(current_chunk)
-            elif line.startswith(("+", "-", " ")) and current_chunk is not None:
-                current_chunk["changes"].append({"type": "addition" if line.startswith("+") else "deletion" if line.startswith("-") else "context", "line": line})
-        
-        if current_change is not None:
-            parsed_diff.append(current_change)
-        
+        for record in iter_parse_diff(diff_output):
+            if isinstance(record, FileDiff):
+                current_change = {"file": record.file, "chunks": []}
+                parsed_diff.append(current_change)
+            else:
+                current_change["chunks"].append(
+                    {"header": record.header, "changes": record.changes}
+                )
         return parsed_diff
 
+    def iter_diff(self, branch1, branch2):
+        """
+        Stream git diff between two branches as FileDiff and Hunk records.
+        The output of git is read line by line while it runs, so memory is
+        bounded by the largest hunk and not by the size of the diff.
+        :param branch1: First branch to compare.
+        :param branch2: Second branch to compare.
+        """
+        repo = Repo(self.destination_path)
+        process = repo.git.diff(branch1, branch2, as_process=True)
+        finished = False
+        try:
+            lines = (
+                line.decode("utf-8", "replace") for line in process.proc.stdout
+            )
+            yield from iter_parse_diff(lines)
+            finished = True
+        finally:
+            process.proc.stdout.close()
+            if finished:
+                process.wait()  # raises GitCommandError if git failed
+            else:
+                process.proc.kill()
+                process.proc.wait()
+
+    def diff_summary(self, branch1, branch2, mode="name-only"):
+        """
+        Summarize the changes between two branches without generating the
+        patch text.
+        :param branch1: First branch to compare.
+        :param branch2: Second branch to compare.
+        :param mode: "name-only" returns the changed paths, "numstat" a list
+            of (added, deleted, path) and "changed-lines" a dict of
+            path -> added + deleted lines. Binary files count as None.
+        :return: The summary of the chosen mode.
+        """
+        if mode not in ("name-only", "numstat", "changed-lines"):
+            raise ValueError(f"Unknown diff summary mode '{mode}'")
+        repo = Repo(self.destination_path)
+        option = "--name-only" if mode == "name-only" else "--numstat"
+        output = repo.git.diff(
+            "-z", "--no-renames", option, branch1, branch2
+        )
+        entries = [entry for entry in output.split("\0") if entry]
+        if mode == "name-only":
+            return entries
+
+        numstat = []
+        for entry in entries:
+            added, deleted, path = entry.split("\t", 2)
+            if added == "-":
+                numstat.append((None, None, path))
+            else:
+                numstat.append((int(added), int(deleted), path))
+        if mode == "numstat":
+            return numstat
+        return {
+            path: None if added is None else added + deleted
+            for added, deleted, path in numstat
+        }
 
+    def diff_index(self, branch1, branch2, cache_dir=None):
+        """
+        Parsed diff between two branches as a DiffIndex, memoized by the
+        commit SHAs they resolve to. Indexes are kept in memory and as JSON
+        files in cache_dir, so a branch pair that did not move is answered
+        with a single rev-parse.
+        :param branch1: First branch to compare.
+        :param branch2: Second branch to compare.
+        :param cache_dir: Folder for the JSON files. Defaults to
+            diff-index in the git directory.
+        :return: DiffIndex of the two branches.
+        """
+        repo = Repo(self.destination_path)
+        old_sha, new_sha = repo.git.rev_parse(branch1, branch2).split()
+        key = f"{old_sha}..{new_sha}"
+        index = self._diff_indexes.get(key)
+        if index is not None:
+            return index
 
+        cache_dir = cache_dir or os.path.join(repo.git_dir, "diff-index")
+        cache_path = os.path.join(cache_dir, f"{key}.json")
+        try:
+            with open(cache_path) as f:
+                index = DiffIndex.from_dict(json.load(f))
+        except (OSError, ValueError):
+            index = DiffIndex.from_records(
+                old_sha, new_sha, self.iter_diff(old_sha, new_sha)
+            )
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(index.to_dict(), f)
+            os.replace(tmp_path, cache_path)
+        self._diff_indexes[key] = index
+        return index
 
-    def git_diff_to_file(self, branch1, branch2):
+    def git_diff_to_file(
+        self, branch1, branch2, output_path=None, max_workers=1,
+        paths_per_job=1000,
+    ):
         """
         Perform a git diff between two branches and write the output to a file.
+        With max_workers above 1 the changed paths are split into jobs of
+        paths_per_job paths, diffed concurrently and written in path order,
+        renames are then shown as a deletion and an addition.
+        The patch is streamed to the file and never held in memory.
         :param branch1: First branch to compare.
         :param branch2: Second branch to compare.
+        :param output_path: File to write the patch to. Without it the parsed
+            records are printed.
+        :param max_workers: Number of concurrent git diff processes.
+        :param paths_per_job: Number of paths diffed by one process.
         """
+        if output_path is None:
+            for item in self.iter_diff(branch1, branch2):
+                print(f"{item=}")
+            return
+
         repo = Repo(self.destination_path)
-        diff_output = repo.git.diff(branch1, branch2)
-        print(f"{diff_output=}")
-        print("**"*20)
-        print("**"*20)
+        if max_workers <= 1:
+            with open(output_path, "wb") as output:
+                repo.git.diff(branch1, branch2, output_stream=output)
+            return
+
+        paths = self.diff_summary(branch1, branch2, "name-only")
+        jobs = [
+            paths[i:i + paths_per_job]
+            for i in range(0, len(paths), paths_per_job)
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+
+            def run_job(index):
+                part_path = os.path.join(tmp, f"{index}.diff")
+                with open(part_path, "wb") as part:
+                    repo.git.diff(
+                        "--no-renames", branch1, branch2, "--",
+                        *(f":(literal){path}" for path in jobs[index]),
+                        output_stream=part,
+                    )
+                return part_path
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                    open(output_path, "wb") as output:
+                for part_path in executor.map(run_job, range(len(jobs))):
+                    with open(part_path, "rb") as part:
+                        shutil.copyfileobj(part, output)
+                    os.remove(part_path)
+
+
+
+class WorktreePool:
+    """
+    Pool of git worktrees of one checkout, for jobs on several branches at
+    once. All worktrees share the object store of the checkout, so each one
+    only costs its work tree on disk.
+    A job leases a worktree for a branch, works in it through a GitHandler,
+    commits and pushes, and returns it. Returned worktrees are reused for
+    the next lease of any branch. Two leases never hold the same branch.
+    Git lets only one worktree check out a branch, so the checkout itself is
+    detached (its files stay as they are) while the pool is open, and its
+    branch, usually main, can be leased like any other. close() checks
+    the branch out again.
+    :param handler: GitHandler of an existing checkout, see
+        clone_or_pull_repository.
+    :param root: Folder for the worktrees. Defaults to a folder next to the
+        checkout.
+    :param max_size: Maximum number of worktrees.
+    """
+
+    def __init__(self, handler, root=None, max_size=4):
+        self.handler = handler
+        self.root = root or os.path.abspath(
+            handler.destination_path.rstrip("/\\") + ".worktrees"
+        )
+        self.max_size = max_size
+        self._repo = Repo(handler.destination_path)
+        handler._set_token_url(self._repo)
+        self._home_branch = None
+        if not self._repo.head.is_detached:
+            self._home_branch = self._repo.active_branch.name
+            self._repo.git.checkout("-q", "--detach")
+        self._idle = []
+        self._created = 0
+        self._leased_branches = set()
+        self._condition = threading.Condition()
+
+    def _acquire(self, branch):
+        with self._condition:
+            while branch in self._leased_branches or (
+                not self._idle and self._created >= self.max_size
+            ):
+                self._condition.wait()
+            self._leased_branches.add(branch)
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+            path = os.path.join(self.root, f"worktree{self._created}")
+        try:
+            self._repo.git.worktree("add", "--detach", path)
+        except GitCommandError:
+            with self._condition:
+                self._created -= 1
+                self._leased_branches.discard(branch)
+                self._condition.notify_all()
+            raise
+        return path
+
+    def _release(self, branch, path):
+        with self._condition:
+            self._leased_branches.discard(branch)
+            self._idle.append(path)
+            self._condition.notify_all()
+
+    @staticmethod
+    def _clean(repo):
+        """Drop every change and untracked file a job left behind."""
+        repo.git.reset("--hard", "-q")
+        repo.git.clean("-fdq")
+
+    def _checkout(self, path, branch):
+        """Check out branch in the worktree from a clean state."""
+        repo = Repo(path)
+        self._clean(repo)
+        remote_ref = f"refs/remotes/origin/{branch}"
+        local_ref = f"refs/heads/{branch}"
+        if self._has_ref(repo, local_ref):
+            repo.git.checkout("-q", branch)
+            if self._has_ref(repo, remote_ref):
+                repo.git.merge("-q", "--ff-only", remote_ref)
+        elif self._has_ref(repo, remote_ref):
+            repo.git.checkout("-q", "-b", branch, remote_ref)
+        else:
+            repo.git.checkout("-q", "-b", branch)
+
+    @staticmethod
+    def _has_ref(repo, ref):
+        try:
+            repo.git.rev_parse("--verify", "-q", ref)
+            return True
+        except GitCommandError:
+            return False
+
+    @contextmanager
+    def lease(self, branch):
+        """
+        Lease a worktree with branch checked out.
+        Blocks while the branch is leased by another job or all worktrees
+        are in use. When the lease ends the worktree is reset, cleaned of
+        untracked files and detached from the branch, so any worktree can
+        take it next.
+        :param branch: Name of the branch.
+        :return: GitHandler working in the leased worktree.
+        """
+        path = self._acquire(branch)
+        try:
+            self._checkout(path, branch)
+            yield GitHandler(
+                self.handler.repo_url, path, self.handler.gitlab_access_token
+            )
+        finally:
+            try:
+                repo = Repo(path)
+                self._clean(repo)
+                repo.git.checkout("-q", "--detach")
+            finally:
+                self._release(branch, path)
+
+    def fetch(self):
+        """Fetch origin once for all worktrees, they share its refs."""
+        self._repo.remote().fetch()
+
+    def close(self):
+        """Remove every worktree of the pool."""
+        with self._condition:
+            paths, self._idle = self._idle, []
+            self._created -= len(paths)
+        for path in paths:
+            self._repo.git.worktree("remove", "--force", path)
+        self._repo.git.worktree("prune")
+        if os.path.isdir(self.root) and not os.listdir(self.root):
+            os.rmdir(self.root)
+        if self._home_branch is not None:
+            # Moves to the commits jobs added to the branch meanwhile
+            self._repo.git.checkout("-q", self._home_branch)
+            self._home_branch = None
 
-        parsed_diff = self.parse_diff_output(diff_output)
-        for item in parsed_diff:
-            print(f"{item=}")
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 # Example usage